@@ -1,35 +1,51 @@
 import asyncio
 import os
-from datetime import datetime
-
-import numpy as np
-from alpaca.trading.client import TradingClient
-from alpaca.trading.enums import AssetClass, OrderSide, TimeInForce
-from alpaca.trading.models import Order, TradeAccount
-from alpaca.trading.requests import MarketOrderRequest
-from dotenv import load_dotenv
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional, Tuple
 
+from backtest.broker import MarketOrder, SimulatedBroker
+from portfolio import Portfolio
 from position import CashPosition, Position
+from shared import OrderSide, Trade, load_env
 from sockets.bar_socket import GLOBAL_BAR_SOCKET
-from sockets.trade_socket import GLOBAL_TRADE_SOCKET
-
+from sockets.trade_socket import GLOBAL_TRADE_SOCKET, OrderSubscriber, TradeSubscriber
 
-class Account:
-    def __init__(self) -> None:
-        load_dotenv()
-        self.trading_client = TradingClient(
-            os.environ.get("ALPACA_KEY"),
-            os.environ.get("ALPACA_SECRET"),
-            paper=True,
-        )
 
-        account = self.trading_client.get_account()
-        positions = self.trading_client.get_all_positions()
+class Account(TradeSubscriber, OrderSubscriber):
+    def __init__(self, trading_client=None, max_workers: int = 8) -> None:
+        load_env()
 
         self.positions = {}
         self.cash_position = CashPosition("$", 100000, 1)
 
+        # NAV and exposure, updated by the positions as they change
+        self.portfolio = Portfolio()
+
+        # outside of prod orders go to a local simulated broker, pass one in
+        # to control its slippage and latency
+        if trading_client is None and os.environ.get("ENV", "") != "prod":
+            trading_client = SimulatedBroker(default_price=130)
+        self.trading_client = trading_client
+
         if os.environ.get("ENV", "") == "prod":
+            # the alpaca trading package is only needed (and imported) here
+            from alpaca.trading.client import TradingClient
+            from alpaca.trading.enums import AssetClass
+            from alpaca.trading.models import TradeAccount
+
+            if self.trading_client is None:
+                self.trading_client = TradingClient(
+                    os.environ.get("ALPACA_KEY"),
+                    os.environ.get("ALPACA_SECRET"),
+                    paper=True,
+                )
+
+            account = self.trading_client.get_account()
+            positions = self.trading_client.get_all_positions()
+
             if isinstance(account, TradeAccount) and account.cash:
                 self.cash_position = CashPosition("$", float(account.cash), 1)
 
@@ -43,60 +59,205 @@ class Account:
                             position.symbol,
                             float(position.qty),
                             float(position.current_price),
+                            float(position.avg_entry_price),
                         )
 
-                        GLOBAL_TRADE_SOCKET.add_subscriber(new_position)
-                        GLOBAL_BAR_SOCKET.add_subscriber(new_position)
+                        GLOBAL_TRADE_SOCKET.add_subscriber(
+                            new_position, position.symbol
+                        )
+                        GLOBAL_BAR_SOCKET.add_subscriber(new_position, position.symbol)
+                        new_position.attach(self.portfolio)
                         self.positions[position.symbol] = new_position
 
+        self.cash_position.attach(self.portfolio)
         GLOBAL_TRADE_SOCKET.add_subscriber(self.cash_position)
 
-    def trade(self, ticker: str, shares: float, order_side: OrderSide):
+        # orders waiting for their fill on the trade socket, keyed by the
+        # client order id they were submitted with, and their partial fills
+        self.pending_fills: Dict[str, Tuple[Future, List[Trade]]] = {}
+        self.pending_lock = threading.Lock()
+        GLOBAL_TRADE_SOCKET.add_subscriber(self)
+        GLOBAL_TRADE_SOCKET.add_order_subscriber(self)
+
+        # one long lived event loop for order submission. The blocking HTTP
+        # calls run on a bounded pool that shares the client's session, so
+        # connections are reused between orders.
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.loop_thread.start()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.order_slots = asyncio.Semaphore(max_workers)
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join()
+        self.executor.shutdown()
+        if isinstance(self.trading_client, SimulatedBroker):
+            self.trading_client.stop()
+
+        GLOBAL_TRADE_SOCKET.remove_subscriber(self)
+        GLOBAL_TRADE_SOCKET.remove_order_subscriber(self)
+        GLOBAL_TRADE_SOCKET.remove_subscriber(self.cash_position)
+        for symbol, position in self.positions.items():
+            GLOBAL_TRADE_SOCKET.remove_subscriber(position, symbol)
+            GLOBAL_BAR_SOCKET.remove_subscriber(position, symbol)
+
+        with self.pending_lock:
+            pending = list(self.pending_fills.values())
+            self.pending_fills.clear()
+        for fill, _ in pending:
+            fill.cancel()
+
+    def trade(self, ticker: str, shares: float, order_side: OrderSide) -> Future:
+        # returns a future that resolves to the Trade once the fill arrives
         if ticker not in self.positions:
             new_position = Position(ticker, 0, 0)
-            GLOBAL_TRADE_SOCKET.add_subscriber(new_position)
-            GLOBAL_BAR_SOCKET.add_subscriber(new_position)
+            GLOBAL_TRADE_SOCKET.add_subscriber(new_position, ticker)
+            GLOBAL_BAR_SOCKET.add_subscriber(new_position, ticker)
+            new_position.attach(self.portfolio)
             self.positions[ticker] = new_position
 
         shares = abs(shares)
 
+        # registered before submitting under an id of our own, the fill can
+        # beat the order response
+        client_order_id = uuid.uuid4().hex
+        fill: Future = Future()
+        with self.pending_lock:
+            self.pending_fills[client_order_id] = (fill, [])
+
+        order_data = self.__order_request(ticker, shares, order_side, client_order_id)
         if os.environ.get("ENV", "") == "prod":
-            self.__trade_prod(ticker, shares, order_side)
+            submission = asyncio.run_coroutine_threadsafe(
+                self.__trade_prod(order_data), self.loop
+            )
+            submission.add_done_callback(
+                partial(self.__submission_done, client_order_id)
+            )
         else:
-            self.__trade_dev(ticker, shares, order_side)
+            # the simulator is local, submit on the caller's thread so fills
+            # without latency land before this returns and replays stay
+            # deterministic
+            try:
+                self.trading_client.submit_order(order_data=order_data)
+            except Exception as e:
+                self.__fail(client_order_id, e)
+
+        return fill
+
+    def trade_many(self, orders: List[Tuple[str, float, OrderSide]]) -> List[Future]:
+        # submits every order before waiting on any of them
+        return [self.trade(ticker, shares, side) for ticker, shares, side in orders]
+
+    async def trade_async(
+        self, ticker: str, shares: float, order_side: OrderSide
+    ) -> Trade:
+        return await asyncio.wrap_future(self.trade(ticker, shares, order_side))
 
-    def __trade_prod(self, ticker: str, shares: float, order_side: OrderSide):
-        market_order_data = MarketOrderRequest(
+    async def trade_many_async(
+        self, orders: List[Tuple[str, float, OrderSide]]
+    ) -> List[Trade]:
+        return await asyncio.gather(
+            *[asyncio.wrap_future(fill) for fill in self.trade_many(orders)]
+        )
+
+    def update_trade(self, trade: Trade):
+        # fills of orders placed elsewhere are not ours to resolve, partial
+        # fills are kept until the order's last one
+        with self.pending_lock:
+            pending = self.pending_fills.get(trade.client_order_id)
+            if pending is None:
+                return
+            fill, fills = pending
+            fills.append(trade)
+            if trade.event != "fill":
+                return
+            del self.pending_fills[trade.client_order_id]
+
+        if len(fills) > 1:
+            # the whole order at its average fill price
+            qty = sum(f.qty for f in fills)
+            price = sum(f.qty * f.price for f in fills) / qty
+            trade = Trade(
+                trade.side,
+                trade.symbol,
+                qty,
+                price,
+                trade.timestamp,
+                trade.order_id,
+                trade.client_order_id,
+            )
+
+        if not fill.done():
+            fill.set_result(trade)
+
+    def update_order(self, event: str, order_id: str, client_order_id: Optional[str]):
+        with self.pending_lock:
+            pending = self.pending_fills.get(client_order_id)
+        if pending is None:
+            return
+
+        filled = sum(trade.qty for trade in pending[1])
+        self.__fail(
+            client_order_id,
+            RuntimeError(f"Order {order_id} {event} after {filled} filled"),
+        )
+
+    def __submission_done(self, client_order_id: str, submission: Future):
+        error = submission.exception()
+        if error is not None:
+            self.__fail(client_order_id, error)
+
+    def __fail(self, client_order_id: str, error: BaseException):
+        with self.pending_lock:
+            pending = self.pending_fills.pop(client_order_id, None)
+        if pending is not None and not pending[0].done():
+            pending[0].set_exception(error)
+
+    def __order_request(
+        self,
+        ticker: str,
+        shares: float,
+        order_side: OrderSide,
+        client_order_id: str,
+    ):
+        if isinstance(self.trading_client, SimulatedBroker):
+            return MarketOrder(ticker, shares, order_side, client_order_id)
+
+        from alpaca.trading.enums import TimeInForce
+        from alpaca.trading.requests import MarketOrderRequest
+
+        return MarketOrderRequest(
             symbol=ticker,
             qty=shares,
             side=order_side,
             time_in_force=TimeInForce.DAY,
+            client_order_id=client_order_id,
         )
-        market_order = self.trading_client.submit_order(order_data=market_order_data)
-
-    def __trade_dev(self, ticker: str, shares: float, order_side: OrderSide):
-        asyncio.run(
-            GLOBAL_TRADE_SOCKET.update_all(
-                {
-                    "qty": shares,
-                    "price": 130 + np.random.normal(0, 1),
-                    "order": {
-                        "side": order_side,
-                        "symbol": ticker,
-                    },
-                    "timestamp": datetime.now(),
-                }
+
+    async def __trade_prod(self, market_order_data):
+        async with self.order_slots:
+            return await self.loop.run_in_executor(
+                self.executor,
+                partial(self.trading_client.submit_order, order_data=market_order_data),
             )
-        )
 
     def balance(self):
-        return self.cash_position.value() + sum(
-            [p.value() for p in self.positions.values()]
-        )
+        return self.portfolio.nav
+
+    def gross_exposure(self) -> float:
+        return self.portfolio.gross
+
+    def net_exposure(self) -> float:
+        return self.portfolio.net
+
+    def weight(self, symbol: str) -> float:
+        return self.portfolio.weight(symbol)
 
     def print_account_positions(self):
         print("Positions:")
         for k, v in self.positions.items():
             print(f"{k}: {v}")
-        print(f"Cash: {self.cash_position.value()}")
+        print(f"Cash: {self.portfolio.cash}")
         print(f"Total: {self.balance()}")
+        print(f"Gross: {self.portfolio.gross} Net: {self.portfolio.net}")
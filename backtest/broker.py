@@ -0,0 +1,174 @@
+import heapq
+import itertools
+import math
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from shared import Bar, OrderSide, timestamp_ns
+from sockets.bar_socket import GLOBAL_BAR_SOCKET, BarSocket, BarSubscriber
+from sockets.trade_socket import GLOBAL_TRADE_SOCKET, TradeSocket
+
+
+@dataclass
+class MarketOrder:
+    # the parts of an alpaca MarketOrderRequest the simulator reads
+    symbol: str
+    qty: float
+    side: OrderSide
+    client_order_id: Optional[str] = None
+
+
+@dataclass
+class SimulatedOrder:
+    id: int
+    symbol: str
+    qty: float
+    side: OrderSide
+    submitted_at: datetime
+    client_order_id: Optional[str] = None
+    status: str = "accepted"
+
+
+class SimulatedBroker(BarSubscriber):
+    # Local stand-in for the Alpaca TradingClient and TradingStream. Market
+    # orders fill against the latest bar close seen on the bar socket, with
+    # slippage against the order's side, after a simulated latency. Fills go
+    # out through the trade socket like real trade updates.
+    #
+    # Latency is in bar time: an order submitted with a latency fills on the
+    # first bar whose timestamp is at or past the last bar's timestamp plus
+    # the latency, on the thread publishing that bar. Fills and bars so reach
+    # positions from the same thread, and replays fill the same way however
+    # fast they run.
+    def __init__(
+        self,
+        slippage_bps: float = 1.0,
+        slippage_std_bps: float = 0.0,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        default_price: Optional[float] = None,
+        seed: Optional[int] = None,
+        bar_socket: BarSocket = GLOBAL_BAR_SOCKET,
+        trade_socket: TradeSocket = GLOBAL_TRADE_SOCKET,
+    ) -> None:
+        self.slippage_bps = slippage_bps
+        self.slippage_std_bps = slippage_std_bps
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+
+        # price used for symbols that haven't had a bar yet, orders for those
+        # are rejected when this is None
+        self.default_price = default_price
+
+        self.rng = np.random.default_rng(seed)
+        self.bar_socket = bar_socket
+        self.trade_socket = trade_socket
+        self.last_close: Dict[str, float] = {}
+        self.order_ids = itertools.count(1)
+        self.filled = 0
+
+        # timestamp (unix seconds) of the last bar, None before the first bar
+        # or when bars don't carry a time
+        self.now: Optional[float] = None
+
+        # orders waiting out their latency, (due time, order id, order)
+        self.pending: List[Tuple[float, int, SimulatedOrder]] = []
+        self.pending_lock = threading.Lock()
+
+        bar_socket.add_subscriber(self)
+
+    def update_bar(self, bar: Bar):
+        self.last_close[bar.symbol] = bar.close
+        self.now = bar_time(bar.timestamp)
+        if self.pending:
+            self.__release()
+
+    def submit_order(self, order_data) -> SimulatedOrder:
+        # same call as TradingClient.submit_order for market orders
+        symbol = order_data.symbol
+        if symbol not in self.last_close and self.default_price is None:
+            raise ValueError(f"No price for {symbol} to fill against")
+
+        order = SimulatedOrder(
+            next(self.order_ids),
+            symbol,
+            float(order_data.qty),
+            order_data.side,
+            datetime.now(),
+            getattr(order_data, "client_order_id", None),
+        )
+
+        delay = self.latency
+        if self.latency_jitter > 0:
+            delay = max(0.0, delay + self.rng.normal(0, self.latency_jitter))
+
+        if delay <= 0:
+            self.__fill(order)
+            return order
+
+        # without a bar time yet the order goes out on the next bar
+        due = -math.inf if self.now is None else self.now + delay
+        with self.pending_lock:
+            heapq.heappush(self.pending, (due, order.id, order))
+
+        return order
+
+    def fill_price(self, symbol: str, side: OrderSide) -> float:
+        price = self.last_close.get(symbol, self.default_price)
+        slippage = self.slippage_bps
+        if self.slippage_std_bps > 0:
+            slippage += self.rng.normal(0, self.slippage_std_bps)
+
+        # slippage always works against the order
+        if side == OrderSide.BUY:
+            return price * (1 + slippage / 10000)
+        return price * (1 - slippage / 10000)
+
+    def __release(self) -> None:
+        # fills every order due by the current bar, oldest due first. Bars
+        # without a time release everything waiting.
+        due = []
+        with self.pending_lock:
+            while self.pending and (self.now is None or self.pending[0][0] <= self.now):
+                due.append(heapq.heappop(self.pending)[2])
+
+        for order in due:
+            self.__fill(order)
+
+    def __fill(self, order: SimulatedOrder) -> None:
+        order.status = "filled"
+        self.filled += 1
+        self.trade_socket.receive(
+            {
+                "event": "fill",
+                "qty": order.qty,
+                "price": self.fill_price(order.symbol, order.side),
+                "order": {
+                    "id": str(order.id),
+                    "client_order_id": order.client_order_id,
+                    "side": order.side,
+                    "symbol": order.symbol,
+                },
+                "timestamp": datetime.now(),
+            }
+        )
+
+    def stop(self) -> None:
+        # stops taking bars, orders still waiting out their latency are
+        # dropped
+        if self in self.bar_socket.wildcard_subscribers:
+            self.bar_socket.remove_subscriber(self)
+        with self.pending_lock:
+            self.pending.clear()
+
+
+def bar_time(timestamp) -> Optional[float]:
+    # unix seconds of a bar timestamp, None when it isn't a time (e.g. "")
+    try:
+        return timestamp_ns(timestamp) / 1e9
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,98 @@
+import argparse
+import heapq
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterator, List, Optional
+
+from data.bar_store import RAW_DIR, BarStore, load_raw_day, raw_days
+from shared import Bar
+from sockets.bar_socket import GLOBAL_BAR_SOCKET, BarSocket
+
+
+@dataclass
+class ReplayStats:
+    bars: int
+    seconds: float
+
+    @property
+    def bars_per_second(self) -> float:
+        return self.bars / self.seconds if self.seconds > 0 else 0.0
+
+    def __repr__(self) -> str:
+        return f"{self.bars} bars in {self.seconds:.2f}s ({self.bars_per_second:.0f} bars/s)"
+
+
+class ReplayEngine:
+    # Streams recorded minute bars through a BarSocket as fast as the
+    # subscribers can take them, in timestamp order across symbols
+    def __init__(
+        self,
+        symbols: List[str],
+        start: date,
+        end: date,
+        raw_dir: str = RAW_DIR,
+        bar_socket: BarSocket = GLOBAL_BAR_SOCKET,
+        store: Optional[BarStore] = None,
+    ) -> None:
+        self.symbols = symbols
+        self.start = start
+        self.end = end
+        self.raw_dir = raw_dir
+        self.bar_socket = bar_socket
+
+        # read from the columnar store instead of the JSON files when given
+        self.store = store
+
+        # close of the latest replayed bar per symbol
+        self.last_close: Dict[str, float] = {}
+
+    def days(self) -> List[date]:
+        days = set()
+        for symbol in self.symbols:
+            if self.store is not None:
+                symbol_days = self.store.days(symbol).tolist()
+            else:
+                symbol_days = raw_days(symbol, self.raw_dir)
+            days.update(day for day in symbol_days if self.start <= day <= self.end)
+
+        return sorted(days)
+
+    def load_day(self, symbol: str, day: date) -> List[Bar]:
+        if self.store is not None:
+            return self.store.load(symbol, day, day).to_bars()
+        return load_raw_day(symbol, day, self.raw_dir)
+
+    def bars(self) -> Iterator[Bar]:
+        for day in self.days():
+            day_bars = [self.load_day(symbol, day) for symbol in self.symbols]
+            yield from heapq.merge(*day_bars, key=lambda bar: bar.timestamp)
+
+    def run(self) -> ReplayStats:
+        count = 0
+        start = time.perf_counter()
+
+        for bar in self.bars():
+            self.last_close[bar.symbol] = bar.close
+            self.bar_socket.publish(bar)
+            count += 1
+
+        return ReplayStats(count, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    from market.initialize import initialize_market_data_system
+
+    parser = argparse.ArgumentParser(description="Replay recorded minute bars")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2017, 1, 1))
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--raw-dir", default=RAW_DIR)
+    parser.add_argument("--store-dir", help="replay from the columnar bar store")
+    args = parser.parse_args()
+
+    store = BarStore(args.store_dir) if args.store_dir else None
+
+    market_data = initialize_market_data_system(args.symbols)
+    engine = ReplayEngine(args.symbols, args.start, args.end, args.raw_dir, store=store)
+    print(engine.run())
@@ -0,0 +1,271 @@
+import argparse
+import csv
+import itertools
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from backtest.replay import ReplayEngine
+from data.bar_store import RAW_DIR, BarStore
+from market.initialize import DEFAULT_PARAMS, initialize_market_data_system
+from market.market_data import MarketData
+from shared import Bar
+from sockets.bar_socket import BarSocket, BarSubscriber
+
+
+def parameter_grid(grid: Dict[str, Iterable[int]]) -> List[Dict[str, int]]:
+    # every combination of the given values, e.g.
+    # {"ema": [5, 10], "vwap": [30, 60]} -> 4 parameter sets
+    names = list(grid)
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*(grid[name] for name in names))
+    ]
+
+
+class TrendScorer(BarSubscriber):
+    # Scores a parameter set by trading on its fields: a symbol is held long
+    # while the fast field is above the slow one and flat otherwise, decided
+    # on each bar's close and earning the next bar's return. Field names are
+    # formatted with the parameters, e.g. "EMA{ema}". Subscribe it after the
+    # market data so it sees the fields already updated.
+    def __init__(
+        self,
+        market_data: MarketData,
+        params: Dict[str, int],
+        fast: str = "EMA{ema}",
+        slow: str = "VWAP",
+    ) -> None:
+        params = {**DEFAULT_PARAMS, **params}
+        fields = {field.name: field for field in market_data.fields}
+        self.fast = fields[fast.format(**params)]
+        self.slow = fields[slow.format(**params)]
+
+        self.symbols = len(market_data.rows)
+        self.last_close: Dict[str, float] = {}
+        self.holding: Dict[str, bool] = {}
+        self.log_return = 0.0
+        self.trades = 0
+        self.bars = 0
+        self.bars_held = 0
+
+    def update_bar(self, bar: Bar):
+        symbol = bar.symbol
+        if self.holding.get(symbol, False):
+            self.log_return += math.log(bar.close / self.last_close[symbol])
+            self.bars_held += 1
+
+        fast = self.fast.data_fields[symbol].data[-1]
+        slow = self.slow.data_fields[symbol].data[-1]
+        holding = bool(fast > slow)
+        if holding != self.holding.get(symbol, False):
+            self.trades += 1
+
+        self.holding[symbol] = holding
+        self.last_close[symbol] = bar.close
+        self.bars += 1
+
+    def results(self) -> Dict[str, float]:
+        # returns are for an equal weight in every symbol
+        return {
+            "log_return": self.log_return / max(self.symbols, 1),
+            "trades": self.trades,
+            "exposure": self.bars_held / self.bars if self.bars else 0.0,
+        }
+
+
+@lru_cache(maxsize=8)
+def load_day(
+    symbols: Tuple[str, ...], day: date, raw_dir: str, store_dir: Optional[str]
+) -> List[Bar]:
+    # one day of bars for every symbol in replay order, kept per worker
+    # process so every parameter set run on the day reuses it
+    store = BarStore(store_dir) if store_dir else None
+    engine = ReplayEngine(list(symbols), day, day, raw_dir, BarSocket(), store)
+    return list(engine.bars())
+
+
+def run_jobs(
+    symbols: Tuple[str, ...],
+    day: date,
+    param_sets: List[Dict[str, int]],
+    raw_dir: str = RAW_DIR,
+    store_dir: Optional[str] = None,
+    window_length: int = 10,
+    fast: str = "EMA{ema}",
+    slow: str = "VWAP",
+) -> List[dict]:
+    # Worker: every parameter set in param_sets on one day, one result row
+    # each. A failing run (or a day that can't be loaded) is reported in its
+    # row's error column instead of failing the sweep.
+    rows = []
+    for params in param_sets:
+        row = {**params, "day": day.isoformat(), "bars": 0}
+        try:
+            # cached, so only the first run of the day loads it
+            bars = load_day(symbols, day, raw_dir, store_dir)
+            row["bars"] = len(bars)
+            bar_socket = BarSocket()
+            market_data = initialize_market_data_system(
+                list(symbols), bar_socket, window_length, params
+            )
+            scorer = TrendScorer(market_data, params, fast, slow)
+            bar_socket.add_subscriber(scorer)
+            for bar in bars:
+                bar_socket.publish(bar)
+            row.update(scorer.results())
+            row["error"] = ""
+        except Exception as e:
+            row["error"] = repr(e)
+        rows.append(row)
+    return rows
+
+
+def run_sweep(
+    symbols: List[str],
+    start: date,
+    end: date,
+    grid: Dict[str, Iterable[int]],
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    raw_dir: str = RAW_DIR,
+    store_dir: Optional[str] = None,
+    window_length: int = 10,
+    fast: str = "EMA{ema}",
+    slow: str = "VWAP",
+) -> List[dict]:
+    # Runs every parameter set of the grid on every day of history between
+    # start and end, on a process pool. Jobs are grouped by day and split
+    # into chunks of parameter sets, so a day is loaded once per chunk (and
+    # at most once per worker while it stays cached) rather than once per
+    # run. Returns one row per (parameter set, day).
+    workers = workers or multiprocessing.cpu_count()
+    param_sets = parameter_grid(grid)
+    chunk_size = chunk_size or max(1, len(param_sets) // workers)
+
+    store = BarStore(store_dir) if store_dir else None
+    days = ReplayEngine(symbols, start, end, raw_dir, BarSocket(), store).days()
+
+    rows = []
+    # spawn so the workers don't inherit the parent's socket and journal
+    # threads
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        futures = [
+            pool.submit(
+                run_jobs,
+                tuple(symbols),
+                day,
+                param_sets[i : i + chunk_size],
+                raw_dir,
+                store_dir,
+                window_length,
+                fast,
+                slow,
+            )
+            for day in days
+            for i in range(0, len(param_sets), chunk_size)
+        ]
+        for future in as_completed(futures):
+            rows.extend(future.result())
+
+    return rows
+
+
+def summarize(rows: List[dict], param_names: List[str]) -> List[dict]:
+    # one row per parameter set over all its days, best total return first
+    groups: Dict[tuple, List[dict]] = {}
+    for row in rows:
+        if not row["error"]:
+            groups.setdefault(tuple(row[name] for name in param_names), []).append(row)
+
+    summary = []
+    for values, runs in groups.items():
+        returns = [run["log_return"] for run in runs]
+        mean = sum(returns) / len(returns)
+        std = math.sqrt(sum((r - mean) ** 2 for r in returns) / len(returns))
+        summary.append(
+            {
+                **dict(zip(param_names, values)),
+                "days": len(runs),
+                "total_log_return": sum(returns),
+                "mean_log_return": mean,
+                "std_log_return": std,
+                "sharpe": mean / std * math.sqrt(252) if std > 0 else 0.0,
+                "trades": sum(run["trades"] for run in runs),
+                "exposure": sum(run["exposure"] for run in runs) / len(runs),
+            }
+        )
+
+    summary.sort(key=lambda row: row["total_log_return"], reverse=True)
+    return summary
+
+
+def write_csv(rows: List[dict], path: str) -> None:
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parse_grid(entries: List[str]) -> Dict[str, List[int]]:
+    # ["sma_short=5,10", "sma_long=30"] -> {"sma_short": [5, 10], "sma_long": [30]}
+    grid = {}
+    for entry in entries:
+        name, values = entry.split("=")
+        grid[name] = [int(value) for value in values.split(",")]
+    return grid
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Backtest a grid of field parameters over recorded days"
+    )
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--start", type=date.fromisoformat, required=True)
+    parser.add_argument("--end", type=date.fromisoformat, required=True)
+    parser.add_argument(
+        "--grid",
+        nargs="+",
+        required=True,
+        help=f"name=v1,v2,... for any of {', '.join(DEFAULT_PARAMS)}",
+    )
+    parser.add_argument("--fast", default="EMA{ema}", help="fast signal field")
+    parser.add_argument("--slow", default="VWAP", help="slow signal field")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--chunk-size", type=int)
+    parser.add_argument("--raw-dir", default=RAW_DIR)
+    parser.add_argument("--store-dir", help="read from the columnar bar store")
+    parser.add_argument("--out", default="sweep.csv", help="summary table")
+    parser.add_argument("--runs-out", help="also write every (params, day) run")
+    args = parser.parse_args()
+
+    grid = parse_grid(args.grid)
+    start = time.perf_counter()
+    rows = run_sweep(
+        args.symbols,
+        args.start,
+        args.end,
+        grid,
+        args.workers,
+        args.chunk_size,
+        args.raw_dir,
+        args.store_dir,
+        fast=args.fast,
+        slow=args.slow,
+    )
+    seconds = time.perf_counter() - start
+
+    summary = summarize(rows, list(grid))
+    write_csv(summary, args.out)
+    if args.runs_out:
+        write_csv(rows, args.runs_out)
+
+    errors = sum(1 for row in rows if row["error"])
+    print(f"{len(rows)} runs in {seconds:.1f}s ({len(rows) / seconds:.1f} runs/s)")
+    print(f"{errors} failed, summary of {len(summary)} parameter sets in {args.out}")
@@ -0,0 +1,48 @@
+# Order throughput through Account -> SimulatedBroker -> TradeSocket ->
+# Position with no network involved. Run from the repo root:
+#   python -m benchmarks.broker --orders 20000 --latency 0.001
+import argparse
+import os
+import time
+from concurrent.futures import wait
+from datetime import datetime
+
+from account import Account
+from backtest.broker import SimulatedBroker
+from shared import Bar, OrderSide
+from sockets.bar_socket import GLOBAL_BAR_SOCKET
+
+
+def run(orders: int, symbols: int, latency: float) -> float:
+    broker = SimulatedBroker(latency=latency, default_price=100, seed=0)
+    account = Account(trading_client=broker)
+    tickers = [f"B{i}" for i in range(symbols)]
+    sides = [OrderSide.BUY, OrderSide.SELL]
+
+    start = time.perf_counter()
+    fills = [
+        account.trade(tickers[i % symbols], 1, sides[i % 2]) for i in range(orders)
+    ]
+    # orders with a latency fill on the next bar past it
+    GLOBAL_BAR_SOCKET.publish(Bar(tickers[0], 100, 100, 100, 100, 1, datetime.now()))
+    wait(fills)
+    elapsed = time.perf_counter() - start
+
+    account.close()
+    assert broker.filled == orders
+    return orders / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark simulated order flow")
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--symbols", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.001)
+    args = parser.parse_args()
+
+    os.environ["ENV"] = "dev"
+
+    print("latency s\torders/s")
+    for latency in [0.0, args.latency]:
+        rate = run(args.orders, args.symbols, latency)
+        print(f"{latency}\t{rate:.0f}")
@@ -0,0 +1,58 @@
+# Measures the cost of fanning one bar out through BarSocket as the number of
+# subscribed symbols grows. Run from the repo root:
+#   python -m benchmarks.dispatch
+import asyncio
+import time
+from datetime import datetime
+
+from shared import Bar
+from sockets.bar_socket import BarSocket, BarSubscriber
+
+
+class CountingSubscriber(BarSubscriber):
+    def __init__(self, symbol: str) -> None:
+        self.symbol = symbol
+        self.count = 0
+
+    def update_bar(self, bar: Bar):
+        if bar.symbol != self.symbol:
+            return
+        self.count += 1
+
+
+def run(num_symbols: int, subs_per_symbol: int = 2, num_bars: int = 20000):
+    socket = BarSocket()
+    symbols = [f"SYM{i}" for i in range(num_symbols)]
+    for symbol in symbols:
+        for _ in range(subs_per_symbol):
+            socket.add_subscriber(CountingSubscriber(symbol), symbol)
+
+    messages = [
+        {
+            "symbol": symbols[i % num_symbols],
+            "open": 130.0,
+            "high": 131.0,
+            "low": 129.0,
+            "close": 130.5,
+            "volume": 1000000,
+            "timestamp": datetime.now(),
+        }
+        for i in range(num_bars)
+    ]
+
+    async def feed():
+        for message in messages:
+            await socket.update_all(message)
+
+    start = time.perf_counter()
+    asyncio.run(feed())
+    elapsed = time.perf_counter() - start
+
+    return elapsed / num_bars
+
+
+if __name__ == "__main__":
+    print("symbols\tus/bar")
+    for num_symbols in [2, 10, 100, 1000, 5000]:
+        per_bar = run(num_symbols)
+        print(f"{num_symbols}\t{per_bar * 1e6:.2f}")
@@ -0,0 +1,163 @@
+# Parity check and per-update cost of the streaming RSI, VWAP and Bollinger
+# band fields against the window-rescanning versions they replaced, plus a
+# parity check of the SMA against the mean of its closes. Exits non-zero if
+# any field is off by more than TOLERANCE.
+#   python -m benchmarks.fields
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from market.simple_fields import (
+    HighBBField,
+    LowBBField,
+    MovingAverageField,
+    RSIField,
+    VWAPField,
+)
+from shared import Bar
+
+# max relative error of a streaming field against its naive version
+TOLERANCE = 1e-9
+
+
+class NaiveRSI:
+    def __init__(self, periods: int):
+        self.diffs = deque(maxlen=periods)
+        self.prev_price = 0
+        self.data = []
+
+    def update(self, bar: Bar):
+        if len(self.data) == 0:
+            self.data.append(50)
+            self.prev_price = bar.close
+            self.diffs.append(0)
+            return
+
+        self.diffs.append(bar.close - self.prev_price)
+        self.prev_price = bar.close
+
+        avg_gain = sum([x for x in self.diffs if x > 0]) / len(self.diffs)
+        avg_loss = abs(sum([x for x in self.diffs if x < 0])) / len(self.diffs)
+        if avg_loss == 0:
+            rsi = 50 if avg_gain == 0 else 100
+        else:
+            rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+        self.data.append(rsi)
+
+
+class NaiveVWAP:
+    def __init__(self, period: int):
+        self.volumes = deque(maxlen=period)
+        self.closes = deque(maxlen=period)
+        self.data = []
+
+    def update(self, bar: Bar):
+        self.volumes.append(bar.volume)
+        self.closes.append(bar.close)
+        self.data.append(
+            sum([x * y for x, y in zip(self.volumes, self.closes)]) / sum(self.volumes)
+        )
+
+
+class NaiveSMA:
+    def __init__(self, period: int):
+        self.closes = deque(maxlen=period)
+        self.data = []
+
+    def update(self, bar: Bar):
+        self.closes.append(bar.close)
+        self.data.append(sum(self.closes) / len(self.closes))
+
+
+class NaiveBB:
+    def __init__(self, period: int, sign: int):
+        self.sma = MovingAverageField("", period, period)
+        self.sign = sign
+        self.data = []
+
+    def update(self, bar: Bar):
+        self.sma.update(bar)
+        std_dev = np.std(self.sma.data.values())
+        self.data.append(self.sma.data[-1] + self.sign * 2 * std_dev)
+
+
+def make_bars(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    closes = 130 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    # flat stretches exercise the no gain / no loss RSI branches
+    closes[n // 3 : n // 3 + 40] = closes[n // 3]
+    volumes = rng.integers(1000, 1000000, n).astype(float)
+    return [
+        Bar("SPY", c, c * 1.001, c * 0.999, c, v, "") for c, v in zip(closes, volumes)
+    ]
+
+
+def streaming_output(field):
+    if isinstance(field, RSIField):
+        return field.data[-1]
+    if isinstance(field, VWAPField):
+        return field.vwap.value
+    if isinstance(field, MovingAverageField):
+        return field.sma.value
+    sign = 1 if isinstance(field, HighBBField) else -1
+    return field.bands.value + sign * 2 * field.bands.std
+
+
+def parity(bars) -> float:
+    # prints each field's max relative error, returns the largest
+    pairs = {
+        "RSI": (RSIField("RSI", 10, 14), NaiveRSI(14)),
+        "VWAP": (VWAPField("VWAP", 10, 60), NaiveVWAP(60)),
+        "SMA": (MovingAverageField("SMA", 10, 30), NaiveSMA(30)),
+        "HighBB": (HighBBField("HighBB", 10, 20), NaiveBB(20, 1)),
+        "LowBB": (LowBBField("LowBB", 10, 20), NaiveBB(20, -1)),
+    }
+    worst = 0.0
+    for name, (field, naive) in pairs.items():
+        max_err = 0.0
+        for bar in bars:
+            field.update(bar)
+            naive.update(bar)
+            err = abs(streaming_output(field) - naive.data[-1])
+            max_err = max(max_err, err / max(abs(naive.data[-1]), 1))
+        print(f"{name}\tmax relative error {max_err:.2e}")
+        worst = max(worst, max_err)
+    return worst
+
+
+def cost(make_field, bars) -> float:
+    field = make_field()
+    start = time.perf_counter()
+    for bar in bars:
+        field.update(bar)
+    return (time.perf_counter() - start) / len(bars)
+
+
+if __name__ == "__main__":
+    bars = make_bars(20000)
+    worst = parity(bars)
+    if not worst <= TOLERANCE:
+        sys.exit(f"Parity failed, max relative error {worst:.2e} > {TOLERANCE:.0e}")
+
+    print("\nfield\tperiod\tstreaming us/bar\tnaive us/bar")
+    for period in [14, 60, 200, 1000]:
+        for name, streaming, naive in [
+            ("RSI", lambda: RSIField("RSI", 10, period), lambda: NaiveRSI(period)),
+            ("VWAP", lambda: VWAPField("VWAP", 10, period), lambda: NaiveVWAP(period)),
+            (
+                "HighBB",
+                lambda: HighBBField("HighBB", 10, period),
+                lambda: NaiveBB(period, 1),
+            ),
+            (
+                "LowBB",
+                lambda: LowBBField("LowBB", 10, period),
+                lambda: NaiveBB(period, -1),
+            ),
+        ]:
+            print(
+                f"{name}\t{period}\t{cost(streaming, bars) * 1e6:.2f}"
+                f"\t{cost(naive, bars) * 1e6:.2f}"
+            )
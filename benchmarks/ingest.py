@@ -0,0 +1,105 @@
+# Cost of turning stream messages into bars and handing them to the
+# vectorized universe engine, per bar vs as one structured batch per minute.
+#   python -m benchmarks.ingest --symbols 1000 --minutes 20
+import argparse
+import asyncio
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+from alpaca.data.models import Bar as SDKBar
+
+from benchmarks.pipeline import raw_message, synthetic_minutes
+from benchmarks.sharding import to_bars
+from market.initialize import initialize_universe_market_data
+from shared import Bar, bars_to_batch
+from sockets.bar_socket import BarSocket, decode_raw_batch
+
+
+@dataclass
+class DictBar:
+    # Bar as it was before slots, for the memory comparison
+    symbol: str
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    timestamp: str
+
+
+def bar_bytes(bar_class, n: int = 100000) -> float:
+    tracemalloc.start()
+    bars = [bar_class("SPY", 1.0, 2.0, 0.5, 1.5, 100.0, "") for _ in range(n)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del bars
+    return size / n
+
+
+def decode_cost(messages, handler, flush=None) -> float:
+    async def feed():
+        for minute in messages:
+            for message in minute:
+                await handler(message)
+        if flush is not None:
+            flush()
+
+    start = time.perf_counter()
+    asyncio.run(feed())
+    return (time.perf_counter() - start) / sum(len(minute) for minute in messages)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark bar ingestion")
+    parser.add_argument("--symbols", type=int, default=1000)
+    parser.add_argument("--minutes", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"bytes per Bar\tslots {bar_bytes(Bar):.0f}\tdict {bar_bytes(DictBar):.0f}")
+
+    symbols = [f"S{i}" for i in range(args.symbols)]
+    messages = synthetic_minutes(symbols, args.minutes)
+    raw = [[raw_message(message) for message in minute] for minute in messages]
+    bars = args.symbols * args.minutes
+
+    # parsing every message into the SDK's model, what raw_data=True skips
+    start = time.perf_counter()
+    for minute in raw:
+        for message in minute:
+            SDKBar(message["S"], {**message, "t": message["t"].to_datetime()})
+    sdk_cost = (time.perf_counter() - start) / bars
+
+    bar_socket = BarSocket()
+    dict_cost = decode_cost(messages, bar_socket.update_all)
+    # buffered per minute and decoded as one batch
+    raw_cost = decode_cost(raw, bar_socket.update_raw, bar_socket.flush_raw)
+    start = time.perf_counter()
+    for minute in raw:
+        decode_raw_batch(minute)
+    batch_cost = (time.perf_counter() - start) / bars
+    print(
+        f"decode us/bar\tsdk model {sdk_cost * 1e6:.2f}\tdict {dict_cost * 1e6:.2f}"
+        f"\traw {raw_cost * 1e6:.2f}"
+        f"\traw batch {batch_cost * 1e6:.2f}"
+    )
+
+    minutes = to_bars(messages)
+    batches = [bars_to_batch(minute) for minute in minutes]
+
+    bar_socket = BarSocket()
+    initialize_universe_market_data(symbols, bar_socket)
+    start = time.perf_counter()
+    for minute in minutes:
+        for bar in minute:
+            bar_socket.publish(bar)
+    per_bar = bars / (time.perf_counter() - start)
+
+    bar_socket = BarSocket()
+    initialize_universe_market_data(symbols, bar_socket)
+    start = time.perf_counter()
+    for batch in batches:
+        bar_socket.publish_batch(batch)
+    per_batch = bars / (time.perf_counter() - start)
+
+    print(f"universe bars/s\tper bar {per_bar:.0f}\tbatched {per_batch:.0f}")
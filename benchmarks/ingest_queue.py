@@ -0,0 +1,94 @@
+# A burst of bars (like the open or a reconnect catch-up) into a socket with
+# a slow subscriber, handled on the stream thread vs through IngestQueue.
+#   python -m benchmarks.ingest_queue --symbols 500 --minutes 10 --cost-us 50
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from benchmarks.pipeline import synthetic_minutes
+from shared import Bar, OrderSide, Trade
+from sockets.bar_socket import BarSocket, BarSubscriber
+from sockets.ingest_queue import IngestQueue
+from sockets.trade_socket import TradeSocket, TradeSubscriber
+
+
+class SlowSubscriber(BarSubscriber, TradeSubscriber):
+    def __init__(self, cost: float) -> None:
+        self.cost = cost
+        self.latest = {}
+        self.trades = 0
+
+    def update_bar(self, bar: Bar):
+        end = time.perf_counter() + self.cost
+        while time.perf_counter() < end:
+            pass
+        self.latest[bar.symbol] = bar.timestamp
+
+    def update_trade(self, trade: Trade):
+        self.trades += 1
+
+
+def run(messages, cost: float, queued: bool) -> dict:
+    bar_socket = BarSocket()
+    trade_socket = TradeSocket()
+    subscriber = SlowSubscriber(cost)
+    bar_socket.add_subscriber(subscriber)
+    trade_socket.add_subscriber(subscriber)
+
+    queue = IngestQueue(bar_socket, trade_socket)
+    if queued:
+        queue.start()
+
+    # raw trade stream message
+    fill = {
+        "stream": "trade_updates",
+        "data": {
+            "event": "fill",
+            "qty": "1",
+            "price": "100",
+            "order": {"side": OrderSide.BUY, "symbol": "S0"},
+            "timestamp": datetime.now(),
+        },
+    }
+
+    async def stream():
+        # what the stream thread spends per message before it can read the
+        # next one
+        for minute in messages:
+            for message in minute:
+                await bar_socket.update_all(message)
+            await trade_socket.update_all(fill)
+
+    start = time.perf_counter()
+    asyncio.run(stream())
+    stream_seconds = time.perf_counter() - start
+    queue.stop()
+    total_seconds = time.perf_counter() - start
+
+    stats = queue.stats()
+    bars = sum(len(minute) for minute in messages)
+    return {
+        "stream_us_per_bar": stream_seconds / bars * 1e6,
+        "drain_seconds": total_seconds,
+        "coalesced": stats["coalesced"],
+        "max_depth": stats["max_depth"],
+        "trades": subscriber.trades,
+        "latest_is_last": all(
+            subscriber.latest[message["symbol"]] == message["timestamp"]
+            for message in messages[-1]
+        ),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the ingest queue")
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--minutes", type=int, default=10)
+    parser.add_argument("--cost-us", type=float, default=50)
+    args = parser.parse_args()
+
+    messages = synthetic_minutes([f"S{i}" for i in range(args.symbols)], args.minutes)
+    for queued in [False, True]:
+        result = run(messages, args.cost_us / 1e6, queued)
+        print("queued" if queued else "direct", result)
@@ -0,0 +1,249 @@
+# End-to-end benchmark of bar ingestion -> indicators -> state. Synthetic
+# minute bars for each universe size are pushed into MarketData and one
+# Position per symbol, as dict messages through BarSocket.update_all and as
+# raw stream messages through update_raw / flush_raw (the live path).
+#   python -m benchmarks.pipeline --universes 1 100 1000 --minutes 20
+# Results are written as JSON so runs on different commits can be diffed.
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+import msgpack
+import numpy as np
+
+from journal import GLOBAL_JOURNAL
+
+from market.initialize import initialize_market_data_system
+from position import Position
+from shared import Bar
+from sockets.bar_socket import GLOBAL_BAR_SOCKET
+
+
+def synthetic_minutes(
+    symbols: List[str], minutes: int, seed: int = 0
+) -> List[List[dict]]:
+    # one list of raw bar messages per minute, random walk closes per symbol
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(
+        np.cumsum(rng.normal(0, 0.001, (minutes, len(symbols))), axis=0)
+    )
+    opens = closes * np.exp(rng.normal(0, 0.0005, closes.shape))
+    volumes = rng.integers(1000, 100000, closes.shape)
+    start = datetime(2023, 1, 3, 9, 30)
+
+    return [
+        [
+            {
+                "symbol": symbol,
+                "open": opens[t, i],
+                "high": max(opens[t, i], closes[t, i]) * 1.0005,
+                "low": min(opens[t, i], closes[t, i]) * 0.9995,
+                "close": closes[t, i],
+                "volume": volumes[t, i],
+                "timestamp": start + timedelta(minutes=t),
+            }
+            for i, symbol in enumerate(symbols)
+        ]
+        for t in range(minutes)
+    ]
+
+
+def raw_message(message: dict) -> dict:
+    # what the stream hands over with raw_data=True
+    return {
+        "T": "b",
+        "S": message["symbol"],
+        "o": message["open"],
+        "h": message["high"],
+        "l": message["low"],
+        "c": message["close"],
+        "v": int(message["volume"]),
+        "n": 100,
+        "vw": message["close"],
+        "t": msgpack.Timestamp.from_datetime(
+            message["timestamp"].replace(tzinfo=timezone.utc)
+        ),
+    }
+
+
+def percentile_us(samples_ns: List[int], q: float) -> float:
+    return float(np.percentile(samples_ns, q)) / 1000 if samples_ns else 0.0
+
+
+def field_costs(market_data, minutes: List[List[dict]]) -> Dict[str, float]:
+    # mean microseconds per update for each field manager, measured on a
+    # second system so the main run's timings aren't disturbed. The shared
+    # indicator graphs are advanced first, as MarketData does, and reported
+    # on their own.
+    totals = {field.name: 0 for field in market_data.fields}
+    totals["IndicatorGraph"] = 0
+    count = 0
+    for minute in minutes:
+        for message in minute:
+            bar = Bar(
+                message["symbol"],
+                float(message["open"]),
+                float(message["high"]),
+                float(message["low"]),
+                float(message["close"]),
+                float(message["volume"]),
+                message["timestamp"],
+            )
+            start = time.perf_counter_ns()
+            for graph in market_data.graphs(bar.symbol):
+                graph.advance(bar)
+            totals["IndicatorGraph"] += time.perf_counter_ns() - start
+            for field in market_data.fields:
+                start = time.perf_counter_ns()
+                field.update_bar(bar)
+                totals[field.name] += time.perf_counter_ns() - start
+            count += 1
+
+    return {name: total / count / 1000 for name, total in totals.items()}
+
+
+def run_universe(size: int, minutes: int, positions: bool, mode: str = "dict") -> dict:
+    # symbols are unique per run so earlier runs' subscribers never see these bars
+    symbols = [f"U{size}{mode}S{i}" for i in range(size)]
+    market_data = initialize_market_data_system(symbols)
+    if positions:
+        for symbol in symbols:
+            GLOBAL_BAR_SOCKET.add_subscriber(Position(symbol, 10, 100), symbol)
+
+    messages = synthetic_minutes(symbols, minutes)
+    if mode == "raw":
+        messages = [[raw_message(message) for message in minute] for minute in messages]
+    bar_latencies: List[int] = []
+    flush_latencies: List[int] = []
+    state_latencies: List[int] = []
+
+    async def feed():
+        for minute in messages:
+            if mode == "raw":
+                # bars are only buffered until the minute is flushed, which the
+                # stream does on the next minute's first bar or a timer
+                for message in minute:
+                    start = time.perf_counter_ns()
+                    await GLOBAL_BAR_SOCKET.update_raw(message)
+                    bar_latencies.append(time.perf_counter_ns() - start)
+
+                start = time.perf_counter_ns()
+                GLOBAL_BAR_SOCKET.flush_raw()
+                flush_latencies.append(time.perf_counter_ns() - start)
+            else:
+                for message in minute:
+                    start = time.perf_counter_ns()
+                    await GLOBAL_BAR_SOCKET.update_all(message)
+                    bar_latencies.append(time.perf_counter_ns() - start)
+
+            start = time.perf_counter_ns()
+            market_data.state_many(symbols)
+            state_latencies.append(time.perf_counter_ns() - start)
+
+    start = time.perf_counter()
+    asyncio.run(feed())
+    elapsed = time.perf_counter() - start
+
+    sample = symbols[:100]
+    cost_system = initialize_market_data_system([f"C{symbol}" for symbol in sample])
+    cost_messages = synthetic_minutes([f"C{symbol}" for symbol in sample], minutes)
+
+    return {
+        "symbols": size,
+        "mode": mode,
+        "minutes": minutes,
+        "bars": len(bar_latencies),
+        "seconds": elapsed,
+        "bars_per_second": len(bar_latencies) / elapsed,
+        "bar_latency_us": {
+            "p50": percentile_us(bar_latencies, 50),
+            "p99": percentile_us(bar_latencies, 99),
+            "mean": float(np.mean(bar_latencies)) / 1000,
+        },
+        # raw mode only, decoding and publishing a whole minute
+        "flush_latency_us": {
+            "p50": percentile_us(flush_latencies, 50),
+            "p99": percentile_us(flush_latencies, 99),
+        },
+        "state_many_latency_us": {
+            "p50": percentile_us(state_latencies, 50),
+            "p99": percentile_us(state_latencies, 99),
+        },
+        "field_cost_us": field_costs(cost_system, cost_messages),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the bar pipeline")
+    parser.add_argument(
+        "--universes", type=int, nargs="+", default=[1, 100, 1000, 5000]
+    )
+    parser.add_argument("--minutes", type=int, default=20)
+    parser.add_argument("--no-positions", action="store_true")
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=["dict", "raw"],
+        default=["dict", "raw"],
+        help="dict messages through update_all, raw ones through update_raw",
+    )
+    parser.add_argument(
+        "--journal", action="store_true", help="record bars to a journal as prod does"
+    )
+    parser.add_argument("--out", help="defaults to benchmarks/results/<commit>.json")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "created": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "runs": [],
+    }
+
+    if args.journal:
+        journal_dir = tempfile.mkdtemp()
+        GLOBAL_JOURNAL.start(os.path.join(journal_dir, "journal.jsonl"))
+
+    # per bar latency of the raw mode is only the buffering, its decode and
+    # publish shows up in the minute's flush
+    print("symbols\tmode\tbars/s\tp50 us\tp99 us\tflush p50 us")
+    for size in args.universes:
+        for mode in args.modes:
+            run = run_universe(size, args.minutes, not args.no_positions, mode)
+            results["runs"].append(run)
+            print(
+                f"{size}\t{mode}\t{run['bars_per_second']:.0f}"
+                f"\t{run['bar_latency_us']['p50']:.1f}"
+                f"\t{run['bar_latency_us']['p99']:.1f}"
+                f"\t{run['flush_latency_us']['p50']:.1f}"
+            )
+
+    if args.journal:
+        GLOBAL_JOURNAL.stop()
+
+    out = args.out or os.path.join("benchmarks", "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"Wrote {out}")
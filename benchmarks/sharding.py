@@ -0,0 +1,77 @@
+# Bars/s through one MarketData vs ShardedMarketData with N worker processes,
+# and a check that both give the same state. Run from the repo root:
+#   python -m benchmarks.sharding --symbols 2000 --minutes 20 --shards 2 4
+# Exits non-zero if a sharded state differs by more than TOLERANCE.
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.pipeline import synthetic_minutes
+from market.initialize import initialize_market_data_system
+from market.sharding import ShardedMarketData
+from shared import Bar
+from sockets.bar_socket import BarSocket
+
+TOLERANCE = 1e-9
+
+
+def to_bars(minutes):
+    return [
+        [
+            Bar(
+                m["symbol"],
+                float(m["open"]),
+                float(m["high"]),
+                float(m["low"]),
+                float(m["close"]),
+                float(m["volume"]),
+                m["timestamp"],
+            )
+            for m in minute
+        ]
+        for minute in minutes
+    ]
+
+
+def feed(bar_socket: BarSocket, market_data, minutes, symbols) -> float:
+    # one state_many per minute, like a strategy reading the universe
+    start = time.perf_counter()
+    for minute in minutes:
+        for bar in minute:
+            bar_socket.publish(bar)
+        market_data.state_many(symbols)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sharded market data")
+    parser.add_argument("--symbols", type=int, default=2000)
+    parser.add_argument("--minutes", type=int, default=20)
+    parser.add_argument("--shards", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--window-length", type=int, default=10)
+    args = parser.parse_args()
+
+    symbols = [f"S{i}" for i in range(args.symbols)]
+    minutes = to_bars(synthetic_minutes(symbols, args.minutes))
+    bars = args.symbols * args.minutes
+
+    bar_socket = BarSocket()
+    single = initialize_market_data_system(symbols, bar_socket, args.window_length)
+    elapsed = feed(bar_socket, single, minutes, symbols)
+    expected = single.state_many(symbols)
+    print("shards\tbars/s\tmax abs diff")
+    print(f"1\t{bars / elapsed:.0f}\t-")
+
+    for shards in args.shards:
+        bar_socket = BarSocket()
+        sharded = ShardedMarketData(
+            symbols, shards, bar_socket=bar_socket, window_length=args.window_length
+        )
+        elapsed = feed(bar_socket, sharded, minutes, symbols)
+        diff = np.max(np.abs(sharded.state_many(symbols) - expected))
+        sharded.close()
+        print(f"{shards}\t{bars / elapsed:.0f}\t{diff:.1e}")
+        if not diff <= TOLERANCE:
+            sys.exit(f"{shards} shards differ by {diff:.1e} > {TOLERANCE:.0e}")
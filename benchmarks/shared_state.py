@@ -0,0 +1,87 @@
+# Cost of publishing MarketData state to shared memory, with and without a
+# reader process polling every symbol. Run from the repo root:
+#   python -m benchmarks.shared_state --symbols 500 --minutes 20
+import argparse
+import multiprocessing
+import time
+
+import numpy as np
+
+from benchmarks.pipeline import synthetic_minutes
+from benchmarks.sharding import to_bars
+from market.initialize import initialize_market_data_system
+from market.shared_state import SharedStateReader
+from sockets.bar_socket import BarSocket
+
+
+def poll(name: str, symbols, stop, reads) -> None:
+    reader = SharedStateReader(name)
+    out = np.empty(
+        (len(symbols), reader.segment.window_length, len(reader.field_names))
+    )
+    count = 0
+    while not stop.is_set():
+        reader.state_many(symbols, out)
+        count += len(symbols)
+    reads.value = count
+    reader.close()
+
+
+def run(symbols, minutes, shared: bool, readers: int) -> float:
+    bar_socket = BarSocket()
+    market_data = initialize_market_data_system(symbols, bar_socket)
+
+    processes = []
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    reads = [context.Value("q", 0) for _ in range(readers)]
+    if shared:
+        writer = market_data.enable_shared_memory()
+        for count in reads:
+            process = context.Process(
+                target=poll, args=(writer.name, symbols, stop, count)
+            )
+            process.start()
+            processes.append(process)
+        # let the readers attach before timing
+        time.sleep(2)
+
+    start = time.perf_counter()
+    for minute in minutes:
+        for bar in minute:
+            bar_socket.publish(bar)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    for process in processes:
+        process.join()
+    if shared:
+        # the final state is what every reader sees
+        reader = SharedStateReader(writer.name)
+        assert np.array_equal(
+            reader.state_many(symbols), market_data.state_many(symbols)
+        )
+        reader.close()
+        market_data.disable_shared_memory()
+
+    total_reads = sum(count.value for count in reads)
+    return len(symbols) * len(minutes) / elapsed, total_reads / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark shared memory state")
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--minutes", type=int, default=20)
+    args = parser.parse_args()
+
+    symbols = [f"S{i}" for i in range(args.symbols)]
+    minutes = to_bars(synthetic_minutes(symbols, args.minutes))
+
+    print("mode\tbars/s\treads/s")
+    for label, shared, readers in [
+        ("off", False, 0),
+        ("shared", True, 0),
+        ("shared+1 reader", True, 1),
+    ]:
+        bars_per_second, reads_per_second = run(symbols, minutes, shared, readers)
+        print(f"{label}\t{bars_per_second:.0f}\t{reads_per_second:.0f}")
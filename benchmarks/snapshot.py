@@ -0,0 +1,68 @@
+# Checkpoint cost of a warmed-up market data system and how long a restart
+# takes to restore it, against warming up again from bars.
+#   python -m benchmarks.snapshot --symbols 1000 5000 --minutes 30
+# Exits non-zero unless every symbol is restored to exactly the same state.
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.pipeline import synthetic_minutes
+from benchmarks.sharding import to_bars
+from market.initialize import initialize_market_data_system
+from market.snapshot import load_snapshot, save_snapshot
+from sockets.bar_socket import BarSocket
+
+
+def warm_system(symbols, minutes):
+    bar_socket = BarSocket()
+    market_data = initialize_market_data_system(symbols, bar_socket)
+    start = time.perf_counter()
+    for minute in minutes:
+        for bar in minute:
+            bar_socket.publish(bar)
+    return market_data, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark snapshot and restore")
+    parser.add_argument("--symbols", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--minutes", type=int, default=30)
+    args = parser.parse_args()
+
+    for size in args.symbols:
+        symbols = [f"S{i}" for i in range(size)]
+        minutes = to_bars(synthetic_minutes(symbols, args.minutes))
+        market_data, warmup = warm_system(symbols, minutes)
+
+        path = os.path.join(tempfile.mkdtemp(), "market_data.npz")
+        start = time.perf_counter()
+        arrays = market_data.snapshot()
+        snapshot = time.perf_counter() - start
+        save_snapshot(arrays, path)
+        save = time.perf_counter() - start - snapshot
+
+        restored_data = initialize_market_data_system(symbols, BarSocket())
+        start = time.perf_counter()
+        arrays = load_snapshot(path)
+        load = time.perf_counter() - start
+        restored = restored_data.restore(arrays, now=minutes[-1][0].timestamp)
+        restore = time.perf_counter() - start - load
+
+        same = np.array_equal(
+            np.asarray(market_data.state_many(symbols)),
+            np.asarray(restored_data.state_many(symbols)),
+            equal_nan=True,
+        )
+        print(
+            f"{size} symbols\twarm-up {warmup * 1000:.0f} ms"
+            f"\tsnapshot {snapshot * 1000:.0f} ms\tsave {save * 1000:.0f} ms"
+            f"\t{os.path.getsize(path) / 1e6:.1f} MB"
+            f"\tload {load * 1000:.0f} ms\trestore {restore * 1000:.0f} ms"
+            f"\trestored {len(restored)}\tsame state {same}"
+        )
+        if not same or len(restored) != size:
+            sys.exit(f"Restore failed, {len(restored)} of {size} restored")
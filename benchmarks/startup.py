@@ -0,0 +1,42 @@
+# Wall time to start a fresh interpreter and import each entry point,
+# median over several runs, with bare interpreter startup subtracted.
+#   python -m benchmarks.startup --runs 7
+# --root points the imports at another checkout to compare against it.
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MODULES = [
+    "shared",
+    "sockets.bar_socket",
+    "market.initialize",
+    "backtest.replay",
+    "position",
+    "account",
+]
+
+
+def startup_seconds(code: str, root: str, runs: int) -> float:
+    env = {**os.environ, "PYTHONPATH": root}
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=root, env=env, check=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark import time")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--root", default=os.getcwd())
+    args = parser.parse_args()
+
+    bare = startup_seconds("pass", args.root, args.runs)
+    print(f"interpreter\t{bare * 1000:.0f} ms")
+    for module in MODULES:
+        seconds = startup_seconds(f"import {module}", args.root, args.runs) - bare
+        print(f"{module}\t{seconds * 1000:.0f} ms")
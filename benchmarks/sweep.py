@@ -0,0 +1,52 @@
+# Cost of one (parameter set, day) backtest run, with the day's bars loaded
+# for every run vs loaded once and reused, and sweep throughput through the
+# process pool.
+#   python -m benchmarks.sweep SPY --raw-dir data/raw --days 4 --workers 2
+import argparse
+import time
+from datetime import date
+
+from backtest.replay import ReplayEngine
+from backtest.sweep import load_day, parameter_grid, run_jobs, run_sweep
+from data.bar_store import RAW_DIR
+from sockets.bar_socket import BarSocket
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parameter sweeps")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--raw-dir", default=RAW_DIR)
+    parser.add_argument("--days", type=int, default=4)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    symbols = tuple(args.symbols)
+    days = ReplayEngine(
+        args.symbols, date.min, date.max, args.raw_dir, BarSocket()
+    ).days()[: args.days]
+    grid = {"ema": [5, 10, 20, 40], "vwap": [30, 60, 120]}
+    param_sets = parameter_grid(grid)
+
+    start = time.perf_counter()
+    for day in days:
+        for params in param_sets:
+            load_day.cache_clear()
+            run_jobs(symbols, day, [params], args.raw_dir)
+    reload = (time.perf_counter() - start) / (len(days) * len(param_sets))
+
+    load_day.cache_clear()
+    start = time.perf_counter()
+    for day in days:
+        run_jobs(symbols, day, param_sets, args.raw_dir)
+    reuse = (time.perf_counter() - start) / (len(days) * len(param_sets))
+
+    start = time.perf_counter()
+    rows = run_sweep(
+        args.symbols, days[0], days[-1], grid, args.workers, raw_dir=args.raw_dir
+    )
+    pooled = len(rows) / (time.perf_counter() - start)
+
+    print(
+        f"ms/run\tloading every run {reload * 1000:.1f}"
+        f"\treusing the day {reuse * 1000:.1f}"
+        f"\tpool runs/s {pooled:.1f}"
+    )
@@ -0,0 +1,107 @@
+# Check that trade updates as the alpaca TradingStream delivers them reach
+# Account: a partial fill, the final fill and a cancel are fed through the
+# stream's own dispatch into TradeSocket.update_all. Exits non-zero on a
+# mismatch. Run from the repo root:
+#   python -m benchmarks.trade_updates
+import asyncio
+import uuid
+
+from alpaca.trading.models import TradeUpdate
+
+from account import Account
+from backtest.broker import SimulatedBroker
+from shared import OrderSide
+from sockets.bar_socket import BarSocket
+from sockets.trade_socket import GLOBAL_TRADE_SOCKET
+
+
+def order_data(client_order_id: str, status: str, filled_qty: str) -> dict:
+    # order object of a trade update, as sent by the API
+    return {
+        "id": str(uuid.uuid4()),
+        "client_order_id": client_order_id,
+        "created_at": "2024-01-02T15:30:00.000000Z",
+        "updated_at": "2024-01-02T15:30:01.000000Z",
+        "submitted_at": "2024-01-02T15:30:00.000000Z",
+        "filled_at": None,
+        "expired_at": None,
+        "canceled_at": None,
+        "failed_at": None,
+        "replaced_at": None,
+        "replaced_by": None,
+        "replaces": None,
+        "asset_id": "b0b6dd9d-8b9b-48a9-ba46-b9d54906e415",
+        "symbol": "AAPL",
+        "asset_class": "us_equity",
+        "notional": None,
+        "qty": "10",
+        "filled_qty": filled_qty,
+        "filled_avg_price": None,
+        "order_class": "",
+        "order_type": "market",
+        "type": "market",
+        "side": "buy",
+        "time_in_force": "day",
+        "limit_price": None,
+        "stop_price": None,
+        "status": status,
+        "extended_hours": False,
+        "legs": None,
+        "trail_percent": None,
+        "trail_price": None,
+        "hwm": None,
+    }
+
+
+def message(event: str, order: dict, qty=None, price=None) -> dict:
+    data = {"event": event, "timestamp": "2024-01-02T15:30:01.000000Z", "order": order}
+    if qty is not None:
+        data.update(
+            qty=qty, price=price, position_qty=qty, execution_id=str(uuid.uuid4())
+        )
+    # the sample has to be a valid trade update for the real model
+    TradeUpdate(**data)
+    return {"stream": "trade_updates", "data": data}
+
+
+def run() -> None:
+    stream = GLOBAL_TRADE_SOCKET.stream
+    stream.subscribe_trade_updates(GLOBAL_TRADE_SOCKET.update_all)
+
+    # the simulated orders never fill (their broker sees no bars), the stream
+    # messages do
+    broker = SimulatedBroker(latency=1, default_price=100, bar_socket=BarSocket())
+    account = Account(trading_client=broker)
+    filled = account.trade("AAPL", 10, OrderSide.BUY)
+    canceled = account.trade("AAPL", 5, OrderSide.BUY)
+    client_ids = list(account.pending_fills)
+
+    async def feed():
+        await stream._dispatch(
+            message(
+                "partial_fill",
+                order_data(client_ids[0], "partially_filled", "4"),
+                "4",
+                "100",
+            )
+        )
+        await stream._dispatch(
+            message("fill", order_data(client_ids[0], "filled", "10"), "6", "110")
+        )
+        await stream._dispatch(
+            message("canceled", order_data(client_ids[1], "canceled", "0"))
+        )
+
+    asyncio.run(feed())
+
+    trade = filled.result(timeout=5)
+    assert trade.qty == 10, trade
+    assert abs(trade.price - 106) < 1e-9, trade
+    assert isinstance(canceled.exception(timeout=5), Exception)
+    assert account.positions["AAPL"].qty == 10
+    account.close()
+
+
+if __name__ == "__main__":
+    run()
+    print("trade updates ok")
@@ -0,0 +1,72 @@
+# Time to seed a fresh market data system with a day of minute bars per
+# symbol, vectorized warm-up vs replaying the same bars bar by bar.
+#   python -m benchmarks.warmup --symbols 500 --bars 390
+# Exits non-zero if the two states differ by more than TOLERANCE.
+import argparse
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from benchmarks.pipeline import synthetic_minutes
+from benchmarks.sharding import to_bars
+from market.initialize import initialize_market_data_system
+from market.warmup import load_client_history, warm_up
+from sockets.bar_socket import BarSocket
+
+TOLERANCE = 1e-9
+
+
+class StandInClient:
+    # answers get_stock_bars like StockHistoricalDataClient, from memory
+    def __init__(self, minutes) -> None:
+        self.bars = {}
+        for minute in minutes:
+            for bar in minute:
+                self.bars.setdefault(bar.symbol, []).append(bar)
+
+    def get_stock_bars(self, request):
+        return SimpleNamespace(
+            data={symbol: self.bars[symbol] for symbol in request.symbol_or_symbols}
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark market data warm-up")
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--bars", type=int, default=390)
+    args = parser.parse_args()
+
+    symbols = [f"S{i}" for i in range(args.symbols)]
+    minutes = to_bars(synthetic_minutes(symbols, args.bars))
+
+    bar_socket = BarSocket()
+    replayed = initialize_market_data_system(symbols, bar_socket)
+    start = time.perf_counter()
+    for minute in minutes:
+        for bar in minute:
+            bar_socket.publish(bar)
+    replay = time.perf_counter() - start
+
+    warmed = initialize_market_data_system(symbols, BarSocket())
+    start = time.perf_counter()
+    history = load_client_history(StandInClient(minutes), symbols, args.bars)
+    load = time.perf_counter() - start
+    seeded = warm_up(warmed, history)
+    seed = time.perf_counter() - start - load
+
+    expected = np.asarray(replayed.state_many(symbols))
+    actual = np.asarray(warmed.state_many(symbols))
+    difference = np.nanmax(np.abs(expected - actual))
+    same_nans = np.array_equal(np.isnan(expected), np.isnan(actual))
+    print(
+        f"{args.symbols} symbols x {args.bars} bars\treplay {replay:.2f} s"
+        f"\tload {load:.2f} s\twarm-up {seed:.2f} s\tseeded {len(seeded)}"
+        f"\tmax difference {difference:.1e}"
+    )
+    if len(seeded) != args.symbols or not same_nans or not difference <= TOLERANCE:
+        sys.exit(
+            f"Warm-up differs from replay by {difference:.1e} > {TOLERANCE:.0e}, "
+            f"seeded {len(seeded)} of {args.symbols}"
+        )
@@ -0,0 +1,224 @@
+import argparse
+import json
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import List
+
+import numpy as np
+import pytz
+
+from shared import Bar
+
+est = pytz.timezone("America/New_York")
+
+RAW_DIR = "data/raw"
+STORE_DIR = "data/store"
+
+# row order of the stored bar columns
+FIELDS = ("open", "high", "low", "close", "volume")
+
+
+def load_raw_day(symbol: str, day: date, raw_dir: str = RAW_DIR) -> List[Bar]:
+    path = os.path.join(raw_dir, symbol, f"{day.strftime('%Y-%m-%d')}.json")
+    if not os.path.exists(path):
+        return []
+
+    with open(path) as file:
+        entries = json.load(file)
+
+    # files written by data/scrape.py only carry the bar's index within the
+    # day, which starts at the 8:30 request window
+    day_start = est.localize(datetime(day.year, day.month, day.day, 8, 30))
+
+    bars = []
+    for entry in entries:
+        if "timestamp" in entry:
+            timestamp = datetime.fromisoformat(entry["timestamp"])
+        else:
+            timestamp = day_start + timedelta(minutes=entry["i"])
+
+        bars.append(
+            Bar(
+                symbol,
+                float(entry["open"]),
+                float(entry["high"]),
+                float(entry["low"]),
+                float(entry["close"]),
+                float(entry["volume"]),
+                timestamp,
+            )
+        )
+
+    return bars
+
+
+def raw_days(symbol: str, raw_dir: str = RAW_DIR) -> List[date]:
+    symbol_dir = os.path.join(raw_dir, symbol)
+    if not os.path.isdir(symbol_dir):
+        return []
+
+    return sorted(
+        date.fromisoformat(file_name[: -len(".json")])
+        for file_name in os.listdir(symbol_dir)
+        if file_name.endswith(".json")
+    )
+
+
+@dataclass
+class StoredBars:
+    symbol: str
+    timestamps: np.ndarray  # unix seconds
+    columns: np.ndarray  # (len(FIELDS), bars), rows in FIELDS order
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def open(self) -> np.ndarray:
+        return self.columns[0]
+
+    @property
+    def high(self) -> np.ndarray:
+        return self.columns[1]
+
+    @property
+    def low(self) -> np.ndarray:
+        return self.columns[2]
+
+    @property
+    def close(self) -> np.ndarray:
+        return self.columns[3]
+
+    @property
+    def volume(self) -> np.ndarray:
+        return self.columns[4]
+
+    def to_bars(self) -> List[Bar]:
+        opens, highs, lows, closes, volumes = self.columns.tolist()
+        return [
+            Bar(
+                self.symbol,
+                opens[i],
+                highs[i],
+                lows[i],
+                closes[i],
+                volumes[i],
+                datetime.fromtimestamp(timestamp, est),
+            )
+            for i, timestamp in enumerate(self.timestamps.tolist())
+        ]
+
+
+def empty_bars(symbol: str) -> StoredBars:
+    return StoredBars(
+        symbol, np.empty(0, dtype=np.int64), np.empty((len(FIELDS), 0), np.float64)
+    )
+
+
+def convert_symbol(symbol: str, raw_dir: str = RAW_DIR, store_dir: str = STORE_DIR):
+    # Rewrites the symbol's store from every per-day JSON file in raw_dir:
+    #   bars.npy        float64 (len(FIELDS), N)
+    #   timestamps.npy  int64 (N,) unix seconds
+    #   days.npy        datetime64[D] (D,)
+    #   offsets.npy     int64 (D + 1,), bars of days[i] are offsets[i]:offsets[i + 1]
+    days = []
+    offsets = [0]
+    timestamps = []
+    columns: List[List[float]] = [[] for _ in FIELDS]
+
+    for day in raw_days(symbol, raw_dir):
+        bars = load_raw_day(symbol, day, raw_dir)
+        if len(bars) == 0:
+            continue
+
+        for bar in bars:
+            timestamps.append(int(bar.timestamp.timestamp()))
+            for column, field in zip(columns, FIELDS):
+                column.append(getattr(bar, field))
+
+        days.append(day)
+        offsets.append(len(timestamps))
+
+    symbol_dir = os.path.join(store_dir, symbol)
+    os.makedirs(symbol_dir, exist_ok=True)
+    np.save(os.path.join(symbol_dir, "bars.npy"), np.array(columns, dtype=np.float64))
+    np.save(
+        os.path.join(symbol_dir, "timestamps.npy"), np.array(timestamps, dtype=np.int64)
+    )
+    np.save(os.path.join(symbol_dir, "days.npy"), np.array(days, dtype="datetime64[D]"))
+    np.save(os.path.join(symbol_dir, "offsets.npy"), np.array(offsets, dtype=np.int64))
+
+
+class BarStore:
+    def __init__(self, store_dir: str = STORE_DIR) -> None:
+        self.store_dir = store_dir
+
+    def symbols(self) -> List[str]:
+        if not os.path.isdir(self.store_dir):
+            return []
+        return sorted(os.listdir(self.store_dir))
+
+    def __has(self, symbol: str) -> bool:
+        return os.path.isdir(os.path.join(self.store_dir, symbol))
+
+    def __load(self, symbol: str, name: str) -> np.ndarray:
+        path = os.path.join(self.store_dir, symbol, f"{name}.npy")
+        return np.load(path, mmap_mode="r")
+
+    def days(self, symbol: str) -> np.ndarray:
+        if not self.__has(symbol):
+            return np.array([], dtype="datetime64[D]")
+        return self.__load(symbol, "days")
+
+    def load(self, symbol: str, start: date, end: date) -> StoredBars:
+        # bars from start to end inclusive, as views into the memory map.
+        # Symbols that were never stored have no bars, like missing JSON days.
+        if not self.__has(symbol):
+            return empty_bars(symbol)
+
+        days = self.__load(symbol, "days")
+        offsets = self.__load(symbol, "offsets")
+
+        first = np.searchsorted(days, np.datetime64(start, "D"), side="left")
+        last = np.searchsorted(days, np.datetime64(end, "D"), side="right")
+        lo = offsets[first]
+        hi = offsets[last]
+
+        return StoredBars(
+            symbol,
+            self.__load(symbol, "timestamps")[lo:hi],
+            self.__load(symbol, "bars")[:, lo:hi],
+        )
+
+    def tail(self, symbol: str, end: date, bars: int) -> StoredBars:
+        # the last `bars` bars up to and including end, however many days
+        # they span
+        if not self.__has(symbol):
+            return empty_bars(symbol)
+
+        days = self.__load(symbol, "days")
+        offsets = self.__load(symbol, "offsets")
+
+        hi = offsets[np.searchsorted(days, np.datetime64(end, "D"), side="right")]
+        lo = max(hi - bars, 0)
+
+        return StoredBars(
+            symbol,
+            self.__load(symbol, "timestamps")[lo:hi],
+            self.__load(symbol, "bars")[:, lo:hi],
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert per-day JSON bars into the columnar bar store"
+    )
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--raw-dir", default=RAW_DIR)
+    parser.add_argument("--store-dir", default=STORE_DIR)
+    args = parser.parse_args()
+
+    for symbol in args.symbols:
+        convert_symbol(symbol, args.raw_dir, args.store_dir)
+        print(f"Converted {symbol}")
@@ -1,91 +1,232 @@
+import argparse
 import json
 import os
+import threading
 import time
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Tuple
 
 import pytz
-from alpaca.data.historical import StockHistoricalDataClient
-from alpaca.data.models import BarSet
-from alpaca.data.requests import StockBarsRequest
-from alpaca.data.timeframe import TimeFrame
-from dotenv import load_dotenv
 
-est = pytz.timezone("America/New_York")
-
-stock = "SPY"
-
-load_dotenv()
-
-API_KEY = os.environ.get("ALPACA_KEY")
-SECRET_KEY = os.environ.get("ALPACA_SECRET")
+from data.bar_store import RAW_DIR
 
+est = pytz.timezone("America/New_York")
 
-client = StockHistoricalDataClient(api_key=API_KEY, secret_key=SECRET_KEY)
+# same intraday window the per-day scraper requested
+WINDOW_OPEN = (8, 30)
+WINDOW_CLOSE = (16, 0)
+
+
+class TokenBucket:
+    # Blocking rate limiter shared by the worker threads: `rate` tokens are
+    # added per second up to `capacity`, each request takes one
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.last_refill) * self.rate
+                )
+                self.last_refill = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+def out_file_path(symbol: str, day: date, raw_dir: str = RAW_DIR) -> str:
+    return os.path.join(raw_dir, symbol, f"{day.strftime('%Y-%m-%d')}.json")
+
+
+def trading_days(start: date, end: date) -> List[date]:
+    # weekdays from start up to but not including end, holidays are found out
+    # from the empty responses
+    days = []
+    cur_date = start
+    while cur_date < end:
+        if cur_date.weekday() < 5:
+            days.append(cur_date)
+        cur_date = cur_date + timedelta(days=1)
+    return days
+
+
+def build_jobs(
+    symbols: List[str],
+    start: date,
+    end: date,
+    days_per_request: int,
+    symbols_per_request: int,
+    raw_dir: str = RAW_DIR,
+) -> List[Tuple[List[str], List[date]]]:
+    # one job per (symbol group, multi-day window). Symbols that already have
+    # every day of a window on disk are left out so reruns resume.
+    days = trading_days(start, end)
+    jobs = []
+
+    for i in range(0, len(days), days_per_request):
+        window = days[i : i + days_per_request]
+        missing = [
+            symbol
+            for symbol in symbols
+            if not all(
+                os.path.exists(out_file_path(symbol, day, raw_dir)) for day in window
+            )
+        ]
+        for j in range(0, len(missing), symbols_per_request):
+            jobs.append((missing[j : j + symbols_per_request], window))
+
+    return jobs
+
+
+def write_day(symbol: str, day: date, entries: list, raw_dir: str = RAW_DIR) -> None:
+    json_data = []
 
-start_date = datetime(2017, 1, 1)
-end_date = datetime(2023, 11, 7)
+    for i, entry in enumerate(entries):
+        json_data.append(
+            {
+                "i": i,
+                "open": entry.open,
+                "high": entry.high,
+                "low": entry.low,
+                "close": entry.close,
+                "volume": entry.volume,
+                "timestamp": entry.timestamp.isoformat(),
+            }
+        )
+
+    path = out_file_path(symbol, day, raw_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # write then rename so an interrupted run never leaves a partial day
+    # behind that a resume would skip
+    with open(path + ".tmp", "w") as file:
+        file.write(json.dumps(json_data))
+    os.replace(path + ".tmp", path)
 
-cur_date = start_date
 
-while cur_date < end_date:
-    window_start = datetime(
-        cur_date.year, cur_date.month, cur_date.day, 8, 30, 0, tzinfo=est
-    )
-    window_end = datetime(
-        cur_date.year, cur_date.month, cur_date.day, 16, 0, 0, tzinfo=est
-    )
+def fetch(
+    client,
+    limiter: TokenBucket,
+    symbols: List[str],
+    window: List[date],
+    raw_dir: str = RAW_DIR,
+) -> int:
+    from alpaca.data.requests import StockBarsRequest
+    from alpaca.data.timeframe import TimeFrame
 
+    first, last = window[0], window[-1]
     request_params = StockBarsRequest(
-        symbol_or_symbols=stock,
+        symbol_or_symbols=symbols,
         timeframe=TimeFrame.Minute,  # type: ignore
-        start=window_start,
-        end=window_end,
+        start=est.localize(datetime(first.year, first.month, first.day, *WINDOW_OPEN)),
+        end=est.localize(datetime(last.year, last.month, last.day, *WINDOW_CLOSE)),
     )
 
-    print(f"Getting data for date {cur_date.strftime('%Y-%m-%d')}")
-
-    out_file_path = f"data/raw/{stock}/{cur_date.strftime('%Y-%m-%d')}.json"
-
-    cur_date = cur_date + timedelta(days=1)
-
-    if os.path.exists(out_file_path):
-        continue
-
+    limiter.acquire()
     try:
         response = client.get_stock_bars(request_params)
-    except AttributeError as e:
-        continue
+    except Exception as e:
+        # nothing is written, the next run retries this window
+        print(f"Warning: request for {symbols} {first} - {last} failed: {e}")
+        return 0
 
-    if not isinstance(response, BarSet):
+    data = getattr(response, "data", None)
+    if not isinstance(data, dict):
         print("Warning: not instance of BarSet")
-        continue
+        return 0
+
+    written = 0
+    for symbol in symbols:
+        by_day: Dict[date, list] = {day: [] for day in window}
+
+        for entry in data.get(symbol, []):
+            timestamp = entry.timestamp.astimezone(est)
+            minute = (timestamp.hour, timestamp.minute)
+            if minute < WINDOW_OPEN or minute > WINDOW_CLOSE:
+                continue
+            if timestamp.date() in by_day:
+                by_day[timestamp.date()].append(entry)
+
+        # days without bars (holidays) are written empty so they aren't
+        # requested again on resume
+        for day, entries in by_day.items():
+            write_day(symbol, day, entries, raw_dir)
+            written += len(entries)
+
+    print(f"Got {written} bars for {symbols} {first} - {last}")
+    return written
+
+
+def scrape(
+    client,
+    symbols: List[str],
+    start: date,
+    end: date,
+    raw_dir: str = RAW_DIR,
+    days_per_request: int = 5,
+    symbols_per_request: int = 20,
+    workers: int = 8,
+    requests_per_minute: float = 200,
+) -> int:
+    # client needs a get_stock_bars(StockBarsRequest) method returning an
+    # object whose .data maps each symbol to its bars, like
+    # StockHistoricalDataClient
+    jobs = build_jobs(
+        symbols, start, end, days_per_request, symbols_per_request, raw_dir
+    )
+    limiter = TokenBucket(requests_per_minute / 60, workers)
 
-    data = response.data.get(stock, [])
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(fetch, client, limiter, group, window, raw_dir)
+            for group, window in jobs
+        ]
+        return sum(future.result() for future in futures)
 
-    if len(data) == 0:
-        print("Warning: No data to add")
-        continue
 
-    json_data = []
+if __name__ == "__main__":
+    from alpaca.data.historical import StockHistoricalDataClient
 
-    for i, entry in enumerate(data):
-        entry_json = entry.model_dump()
+    from shared import load_env
 
-        new_data = {
-            "i": i,
-            "open": entry_json.get("open"),
-            "high": entry_json.get("high"),
-            "low": entry_json.get("low"),
-            "close": entry_json.get("close"),
-            "volume": entry_json.get("volume"),
-        }
+    parser = argparse.ArgumentParser(description="Backfill minute bars into data/raw")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2017, 1, 1))
+    parser.add_argument("--end", type=date.fromisoformat, default=date(2023, 11, 7))
+    parser.add_argument("--raw-dir", default=RAW_DIR)
+    parser.add_argument("--days-per-request", type=int, default=5)
+    parser.add_argument("--symbols-per-request", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--requests-per-minute", type=float, default=200)
+    args = parser.parse_args()
 
-        json_data.append(new_data)
+    load_env()
 
-    with open(out_file_path, "w") as file:
-        file.write(json.dumps(json_data))
-        print("Wrote to file " + out_file_path)
-
-    file.close()
+    client = StockHistoricalDataClient(
+        api_key=os.environ.get("ALPACA_KEY"),
+        secret_key=os.environ.get("ALPACA_SECRET"),
+    )
 
-    time.sleep(60 / 200)
+    scrape(
+        client,
+        args.symbols,
+        args.start,
+        args.end,
+        args.raw_dir,
+        args.days_per_request,
+        args.symbols_per_request,
+        args.workers,
+        args.requests_per_minute,
+    )
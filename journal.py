@@ -0,0 +1,101 @@
+import json
+import os
+import queue
+import threading
+import time
+from typing import Optional
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+# number of events the writer thread takes off the queue per write
+BATCH_SIZE = 1024
+
+
+class EventJournal:
+    # Structured event log for the hot path. record() only puts a tuple on a
+    # bounded queue, a background thread turns the events into JSON lines.
+    # When the queue is full events are dropped and counted rather than
+    # blocking the caller.
+    def __init__(self, level: int = INFO, max_queue: int = 100000) -> None:
+        self.level = level
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.written = 0
+
+        self.thread: Optional[threading.Thread] = None
+        self.stop_flag = threading.Event()
+
+    def enabled(self, level: int) -> bool:
+        # check this before building expensive event fields
+        return self.thread is not None and level >= self.level
+
+    def record(self, level: int, event: str, **fields) -> None:
+        if not self.enabled(level):
+            return
+
+        try:
+            self.queue.put_nowait((time.time(), level, event, fields))
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self, path: str) -> None:
+        if self.thread is not None:
+            return
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.stop_flag.clear()
+        self.thread = threading.Thread(
+            target=self._run_thread, args=(path,), daemon=True
+        )
+        self.thread.start()
+
+    def stop(self) -> None:
+        # writes out whatever is still queued before returning
+        if self.thread is None:
+            return
+
+        thread = self.thread
+        self.thread = None
+        self.stop_flag.set()
+        thread.join()
+
+    def _run_thread(self, path: str) -> None:
+        with open(path, "a") as file:
+            while True:
+                try:
+                    events = [self.queue.get(timeout=0.1)]
+                except queue.Empty:
+                    if self.stop_flag.is_set():
+                        return
+                    continue
+
+                while len(events) < BATCH_SIZE:
+                    try:
+                        events.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                lines = []
+                for t, level, event, fields in events:
+                    entry = {
+                        "t": t,
+                        "level": LEVEL_NAMES.get(level, level),
+                        "event": event,
+                    }
+                    entry.update(fields)
+                    lines.append(json.dumps(entry, separators=(",", ":"), default=str))
+
+                try:
+                    file.write("\n".join(lines) + "\n")
+                    file.flush()
+                    self.written += len(lines)
+                except Exception as e:
+                    print("Error writing journal: ", e)
+
+
+GLOBAL_JOURNAL = EventJournal()
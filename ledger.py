@@ -0,0 +1,121 @@
+import os
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+TRADE_DTYPE = np.dtype(
+    [
+        ("timestamp", np.float64),  # epoch seconds, nan when unknown
+        ("side", np.int8),  # 1 buy, -1 sell
+        ("qty", np.float64),
+        ("price", np.float64),
+    ]
+)
+
+
+def _epoch(timestamp) -> float:
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    try:
+        return float(timestamp)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+class TradeLedger:
+    # Fills of one position in a fixed size structured array, with the cost
+    # basis and P&L kept up to date per fill instead of derived from history.
+    # When the array is full it is written to spill_dir as one .npy chunk and
+    # reused, or without a spill_dir the oldest fills are overwritten.
+    def __init__(
+        self,
+        symbol: str,
+        qty: float = 0,
+        avg_cost: float = 0,
+        capacity: int = 1024,
+        spill_dir: Optional[str] = None,
+    ) -> None:
+        self.symbol = symbol
+        self.trades = np.zeros(capacity, dtype=TRADE_DTYPE)
+        self.head = 0  # index of the next write
+        self.count = 0  # fills held in memory
+        self.total = 0  # fills ever recorded
+
+        self.spill_dir = spill_dir
+        self.chunks: List[str] = []
+        # chunk files are prefixed per ledger so restarts don't overwrite
+        # earlier runs' chunks
+        self.session = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+
+        # signed quantity, average cost of the open quantity and P&L of the
+        # quantity closed so far
+        self.qty = qty
+        self.avg_cost = avg_cost if qty != 0 else 0.0
+        self.realized = 0.0
+
+    def __len__(self) -> int:
+        return self.total
+
+    def record(self, side: int, qty: float, price: float, timestamp=None) -> None:
+        if self.count == len(self.trades):
+            if self.spill_dir is not None:
+                self.spill()
+            else:
+                self.count -= 1
+
+        self.trades[self.head] = (_epoch(timestamp), side, qty, price)
+        self.head = (self.head + 1) % len(self.trades)
+        self.count += 1
+        self.total += 1
+
+        self.__apply(side * qty, price)
+
+    def __apply(self, change: float, price: float) -> None:
+        if change == 0:
+            return
+
+        old = self.qty
+        new = old + change
+
+        if old == 0 or (old > 0) == (change > 0):
+            # opening or adding, the cost basis is a weighted average
+            self.avg_cost = (abs(old) * self.avg_cost + abs(change) * price) / abs(new)
+        else:
+            # reducing, closing, or flipping through zero
+            closed = min(abs(change), abs(old))
+            self.realized += closed * (price - self.avg_cost) * (1 if old > 0 else -1)
+            if new == 0:
+                self.avg_cost = 0.0
+            elif (new > 0) != (old > 0):
+                # the part past zero opens a new position at this price
+                self.avg_cost = price
+
+        self.qty = new
+
+    def unrealized(self, price: float) -> float:
+        return self.qty * (price - self.avg_cost)
+
+    def recent(self) -> np.ndarray:
+        # copy of the fills held in memory, oldest first
+        start = (self.head - self.count) % len(self.trades)
+        return np.roll(self.trades, -start)[: self.count]
+
+    def spill(self) -> None:
+        # writes the in memory fills out as the next chunk and empties the
+        # array, every fill stays reachable through history()
+        if self.count == 0:
+            return
+
+        directory = os.path.join(self.spill_dir or ".", self.symbol)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.session}-{len(self.chunks):06d}.npy")
+        np.save(path, self.recent())
+
+        self.chunks.append(path)
+        self.head = 0
+        self.count = 0
+
+    def history(self) -> np.ndarray:
+        # every fill still available, spilled chunks first
+        return np.concatenate([np.load(path) for path in self.chunks] + [self.recent()])
@@ -1,20 +1,46 @@
 import asyncio
 import os
 import time
-from datetime import datetime
+from datetime import date, datetime
 
 import numpy as np
-from alpaca.trading.enums import OrderSide
 
 from account import Account
+from data.bar_store import BarStore
+from journal import GLOBAL_JOURNAL
 from market.initialize import initialize_market_data_system
+from market.snapshot import Checkpointer, load_snapshot
+from market.warmup import load_store_history, warm_up
+from shared import OrderSide
 from sockets.bar_socket import GLOBAL_BAR_SOCKET
 from sockets.trade_socket import GLOBAL_TRADE_SOCKET
 
+GLOBAL_JOURNAL.start("logs/journal.jsonl")
+
 stock_symbols = ["AAPL", "TSLA"]
 
 market_data = initialize_market_data_system(stock_symbols)
 
+# pick up the indicator state of the last run if it is recent enough, and
+# seed the rest from local history
+checkpoint_path = "checkpoints/market_data.npz"
+restored = []
+if os.path.exists(checkpoint_path):
+    try:
+        restored = market_data.restore(load_snapshot(checkpoint_path))
+        print("Restored market data for", restored)
+    except ValueError as e:
+        # written with other fields or parameters, start from history instead
+        print("Ignoring checkpoint: ", e)
+cold_symbols = [symbol for symbol in stock_symbols if symbol not in restored]
+warmed = warm_up(
+    market_data, load_store_history(BarStore(), cold_symbols, date.today())
+)
+if warmed:
+    print("Warmed up market data for", warmed)
+checkpointer = Checkpointer(market_data, checkpoint_path)
+checkpointer.start()
+
 for symbol in stock_symbols:
     GLOBAL_BAR_SOCKET.subscribe_to_symbol(symbol)
 
@@ -52,5 +78,8 @@ for obs in aapl_state:
     print(obs)
 
 
+checkpointer.stop()
+account.close()
 GLOBAL_TRADE_SOCKET.stop()
 GLOBAL_BAR_SOCKET.stop()
+GLOBAL_JOURNAL.stop()
@@ -1,17 +1,26 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Type
+from typing import Dict, List, Optional, Type
 
 import numpy as np
 
+from market.indicator_graph import IndicatorGraph, IndicatorGraphs
 from shared import Bar
 from sockets.bar_socket import BarSubscriber
 
 
 class DataField(ABC):
-    def __init__(self, name, window_length):
+    # snapshot state and configuration, see market.snapshot
+    STATE: dict = {}
+    CONFIG = ("window_length",)
+
+    def __init__(self, name, window_length, graph: Optional[IndicatorGraph] = None):
         self.name = name
         self.window_length = window_length
 
+        # intermediate indicators, shared with the symbol's other fields when
+        # the managers were given the same IndicatorGraphs
+        self.graph = graph if graph is not None else IndicatorGraph()
+
     @abstractmethod
     def get_data(self) -> np.ndarray:
         pass
@@ -28,6 +37,7 @@ class DataFieldManager(BarSubscriber):
         window_length: int,
         data_field_class: Type[DataField],
         *args,
+        graphs: Optional[IndicatorGraphs] = None,
         **kwargs,
     ):
         self.window_length = window_length
@@ -35,6 +45,7 @@ class DataFieldManager(BarSubscriber):
         self.data_field_class = data_field_class
         self.data_field_args = args
         self.data_field_kwargs = kwargs
+        self.graphs = graphs
         self.data_fields: Dict[
             str, data_field_class
         ] = {}  # maps a symbol to a datafield
@@ -44,15 +55,21 @@ class DataFieldManager(BarSubscriber):
 
     def register_symbol(self, symbol: str):
         if symbol not in self.data_fields:
+            kwargs = self.data_field_kwargs
+            if self.graphs is not None:
+                kwargs = {**kwargs, "graph": self.graphs.for_symbol(symbol)}
             self.data_fields[symbol] = self.data_field_class(
                 self.name,
                 self.window_length,
                 *self.data_field_args,
-                **self.data_field_kwargs,
+                **kwargs,
             )
         else:
             raise ValueError(f"Symbol {symbol} is already registered in {self.name}")
 
+    def symbols(self) -> List[str]:
+        return list(self.data_fields.keys())
+
     def update_bar(self, bar: Bar):
         symbol = bar.symbol
         self.__check_symbol(symbol)
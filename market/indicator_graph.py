@@ -0,0 +1,191 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Tuple
+
+from market.rolling import RollingSum, RollingVariance
+from shared import Bar
+
+
+class IndicatorNode(ABC):
+    # One intermediate series of a symbol's indicator graph. Nodes ask the
+    # graph for the nodes they depend on in __init__, so those always come
+    # earlier in the graph's update order. STATE and CONFIG are what a
+    # snapshot saves and checks, see market.snapshot.
+    STATE = {"value": float}
+    CONFIG = ()
+
+    def __init__(self, graph: "IndicatorGraph"):
+        self.value = 0.0
+
+    @abstractmethod
+    def update(self, bar: Bar) -> None:
+        pass
+
+
+class SMANode(IndicatorNode):
+    # Simple moving average of the last `period` closes (of every close so
+    # far while fewer have been seen)
+    STATE = {"value": float, "closes": RollingSum}
+    CONFIG = ("period",)
+
+    def __init__(self, graph: "IndicatorGraph", period: int):
+        super().__init__(graph)
+        self.period = period
+        self.closes = RollingSum(period)
+
+    def update(self, bar: Bar) -> None:
+        self.closes.append(bar.close)
+        self.value = self.closes.total / len(self.closes)
+
+
+class EMANode(IndicatorNode):
+    STATE = {"value": float, "count": int}
+    CONFIG = ("multiplier",)
+
+    def __init__(self, graph: "IndicatorGraph", period: int):
+        super().__init__(graph)
+        self.multiplier = 2 / (period + 1)
+        self.count = 0
+
+    def update(self, bar: Bar) -> None:
+        if self.count == 0:
+            self.value = bar.close
+        else:
+            self.value = (
+                self.value * (1 - self.multiplier) + bar.close * self.multiplier
+            )
+        self.count += 1
+
+
+class MACDNode(IndicatorNode):
+    def __init__(self, graph: "IndicatorGraph", short: int = 12, long: int = 26):
+        super().__init__(graph)
+        self.short_ema = graph.node(EMANode, short)
+        self.long_ema = graph.node(EMANode, long)
+
+    def update(self, bar: Bar) -> None:
+        self.value = self.short_ema.value - self.long_ema.value
+
+
+class RSINode(IndicatorNode):
+    STATE = {
+        "value": float,
+        "prev_price": float,
+        "count": int,
+        "gains": RollingSum,
+        "losses": RollingSum,
+    }
+
+    def __init__(self, graph: "IndicatorGraph", periods: int):
+        super().__init__(graph)
+
+        # gains and losses (as positive numbers) over the last `periods` diffs
+        self.gains = RollingSum(periods)
+        self.losses = RollingSum(periods)
+        self.prev_price = 0
+        self.count = 0
+
+    def update(self, bar: Bar) -> None:
+        close = bar.close
+        self.count += 1
+
+        if self.count == 1:
+            self.value = 50
+            self.prev_price = close
+            self.gains.append(0)
+            self.losses.append(0)
+            return
+
+        diff = close - self.prev_price
+        self.gains.append(max(diff, 0))
+        self.losses.append(max(-diff, 0))
+
+        self.prev_price = close
+
+        avg_gain = self.gains.total / len(self.gains)
+        avg_loss = self.losses.total / len(self.losses)
+
+        if avg_loss == 0:
+            if avg_gain == 0:
+                rsi = 50  # Neutral RSI when there's no gain or loss
+            else:
+                rsi = 100  # Max RSI when there's gain and no loss
+        else:
+            rs = avg_gain / avg_loss
+            rsi = 100 - (100 / (1 + rs))
+
+        self.value = rsi
+
+
+class VWAPNode(IndicatorNode):
+    STATE = {"value": float, "volumes": RollingSum, "price_volumes": RollingSum}
+
+    def __init__(self, graph: "IndicatorGraph", period: int):
+        super().__init__(graph)
+        self.volumes = RollingSum(period)
+        self.price_volumes = RollingSum(period)
+
+    def update(self, bar: Bar) -> None:
+        self.volumes.append(bar.volume)
+        self.price_volumes.append(bar.volume * bar.close)
+        self.value = self.price_volumes.total / self.volumes.total
+
+
+class BollingerNode(IndicatorNode):
+    # SMA of the close and the population std of its last `period` values,
+    # shared by the high and low bands
+    STATE = {"value": float, "std": float, "sma_variance": RollingVariance}
+
+    def __init__(self, graph: "IndicatorGraph", period: int):
+        super().__init__(graph)
+        self.sma = graph.node(SMANode, period)
+        self.sma_variance = RollingVariance(period)
+        self.std = 0.0
+
+    def update(self, bar: Bar) -> None:
+        self.sma_variance.append(self.sma.value)
+        self.value = self.sma.value
+        self.std = self.sma_variance.std()
+
+
+class IndicatorGraph:
+    # The indicator nodes of one symbol. Identical nodes (same type and
+    # parameters) are created once and shared by every field that asks for
+    # them, and each bar runs every node exactly once in dependency order no
+    # matter how many fields pass it in.
+    def __init__(self) -> None:
+        self.nodes: Dict[Tuple, IndicatorNode] = {}
+        self.order: List[IndicatorNode] = []
+        self.last_bar = None
+
+    def node(self, node_class, *params) -> IndicatorNode:
+        key = (node_class, *params)
+        node = self.nodes.get(key)
+        if node is None:
+            # dependencies are created (and ordered) inside the constructor
+            node = node_class(self, *params)
+            self.nodes[key] = node
+            self.order.append(node)
+        return node
+
+    def advance(self, bar: Bar) -> None:
+        # the first field to see a bar runs the graph, the rest reuse it
+        if bar is self.last_bar:
+            return
+        self.last_bar = bar
+
+        for node in self.order:
+            node.update(bar)
+
+
+class IndicatorGraphs:
+    # one graph per symbol, handed to every DataFieldManager of a system so
+    # their fields share nodes
+    def __init__(self) -> None:
+        self.graphs: Dict[str, IndicatorGraph] = {}
+
+    def for_symbol(self, symbol: str) -> IndicatorGraph:
+        graph = self.graphs.get(symbol)
+        if graph is None:
+            graph = IndicatorGraph()
+            self.graphs[symbol] = graph
+        return graph
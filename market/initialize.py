@@ -1,7 +1,10 @@
-from typing import List
+from typing import Dict, Iterable, List, Optional
 
 from market.data_field import DataFieldManager
+from market.indicator_graph import IndicatorGraphs
 from market.market_data import MarketData
+from market.multi_timeframe import MultiTimeframeMarketData
+from market.resample import BarResampler
 from market.simple_fields import (
     ClosePriceField,
     ExponentialMovingAverageField,
@@ -16,27 +19,95 @@ from market.simple_fields import (
     VolumeField,
     VWAPField,
 )
+from market.universe import UniverseMarketData
+from market.vector_fields import (
+    VectorClosePriceField,
+    VectorExponentialMovingAverageField,
+    VectorHighBBField,
+    VectorHighPriceField,
+    VectorLowBBField,
+    VectorLowPriceField,
+    VectorMACDField,
+    VectorMovingAverageField,
+    VectorOpenPriceField,
+    VectorRSIField,
+    VectorVolumeField,
+    VectorVWAPField,
+)
+from sockets.bar_socket import GLOBAL_BAR_SOCKET, BarSocket
+
+# field periods of initialize_market_data_system, any of them can be
+# overridden through its params
+DEFAULT_PARAMS = {
+    "sma_short": 10,
+    "sma_long": 30,
+    "ema": 10,
+    "rsi": 14,
+    "macd_short": 12,
+    "macd_long": 26,
+    "vwap": 60,
+    "bb": 20,
+}
+
 
+def initialize_market_data_system(
+    stock_symbols: List[str],
+    bar_socket: BarSocket = GLOBAL_BAR_SOCKET,
+    window_length: int = 10,
+    params: Optional[Dict[str, int]] = None,
+):
+    unknown = set(params or {}) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown field parameters {sorted(unknown)}")
+    p = {**DEFAULT_PARAMS, **(params or {})}
+    if p["sma_short"] == p["sma_long"]:
+        # both fields would be named SMA{period}
+        raise ValueError(f"sma_short and sma_long are both {p['sma_short']}")
 
-def initialize_market_data_system(stock_symbols: List[str]):
-    # Define the window length for data
-    window_length = 10  # Example length
+    # Fields of a symbol share one indicator graph, so common intermediates
+    # (EMAs, SMAs, band statistics) are computed once per bar
+    graphs = IndicatorGraphs()
 
     # Create DataFieldManager for each type of data
     field_managers = [
-        DataFieldManager("Open", window_length, OpenPriceField),
-        DataFieldManager("Low", window_length, LowPriceField),
-        DataFieldManager("High", window_length, HighPriceField),
-        DataFieldManager("Close", window_length, ClosePriceField),
-        DataFieldManager("Volume", window_length, VolumeField),
-        DataFieldManager("SMA10", window_length, MovingAverageField, 10),
-        DataFieldManager("SMA30", window_length, MovingAverageField, 30),
-        DataFieldManager("EMA10", window_length, ExponentialMovingAverageField, 10),
-        DataFieldManager("RSI", window_length, RSIField, 14),
-        DataFieldManager("MACD", window_length, MACDFIeld),
-        DataFieldManager("VWAP", window_length, VWAPField),
-        DataFieldManager("HighBB", window_length, HighBBField),
-        DataFieldManager("LowBB", window_length, LowBBField),
+        DataFieldManager("Open", window_length, OpenPriceField, graphs=graphs),
+        DataFieldManager("Low", window_length, LowPriceField, graphs=graphs),
+        DataFieldManager("High", window_length, HighPriceField, graphs=graphs),
+        DataFieldManager("Close", window_length, ClosePriceField, graphs=graphs),
+        DataFieldManager("Volume", window_length, VolumeField, graphs=graphs),
+        DataFieldManager(
+            f"SMA{p['sma_short']}",
+            window_length,
+            MovingAverageField,
+            p["sma_short"],
+            graphs=graphs,
+        ),
+        DataFieldManager(
+            f"SMA{p['sma_long']}",
+            window_length,
+            MovingAverageField,
+            p["sma_long"],
+            graphs=graphs,
+        ),
+        DataFieldManager(
+            f"EMA{p['ema']}",
+            window_length,
+            ExponentialMovingAverageField,
+            p["ema"],
+            graphs=graphs,
+        ),
+        DataFieldManager("RSI", window_length, RSIField, p["rsi"], graphs=graphs),
+        DataFieldManager(
+            "MACD",
+            window_length,
+            MACDFIeld,
+            p["macd_short"],
+            p["macd_long"],
+            graphs=graphs,
+        ),
+        DataFieldManager("VWAP", window_length, VWAPField, p["vwap"], graphs=graphs),
+        DataFieldManager("HighBB", window_length, HighBBField, p["bb"], graphs=graphs),
+        DataFieldManager("LowBB", window_length, LowBBField, p["bb"], graphs=graphs),
     ]
 
     # Define the stock symbols you are interested in
@@ -47,8 +118,62 @@ def initialize_market_data_system(stock_symbols: List[str]):
             fm.register_symbol(symbol)
 
     # Set up the MarketData with the managers
-    market_data = MarketData(window_length)
+    market_data = MarketData(window_length, bar_socket)
     for fm in field_managers:
         market_data.add_field(fm)
 
     return market_data
+
+
+def initialize_multi_timeframe_market_data(
+    stock_symbols: List[str],
+    timeframes: Iterable[int] = (1, 5, 15, 60),
+    bar_socket: BarSocket = GLOBAL_BAR_SOCKET,
+    window_length: int = 10,
+    offset: int = 30,
+    params: Optional[Dict[str, int]] = None,
+):
+    # One full set of fields per timeframe (in minutes). Longer bars are
+    # resampled from the 1 minute stream, hourly bars start at the 9:30 open
+    # by default.
+    market_data = {}
+    for minutes in timeframes:
+        source = bar_socket
+        if minutes != 1:
+            source = BarResampler(minutes, bar_socket, offset % minutes)
+        market_data[minutes] = initialize_market_data_system(
+            stock_symbols, source, window_length, params
+        )
+
+    return MultiTimeframeMarketData(market_data)
+
+
+def initialize_universe_market_data(
+    stock_symbols: List[str],
+    bar_socket: BarSocket = GLOBAL_BAR_SOCKET,
+    window_length: int = 10,
+):
+    # Same fields as initialize_market_data_system, but every symbol is held
+    # in one vectorized engine instead of one object per symbol per field
+    market_data = UniverseMarketData(window_length, bar_socket)
+    for field in [
+        VectorOpenPriceField("Open", window_length),
+        VectorLowPriceField("Low", window_length),
+        VectorHighPriceField("High", window_length),
+        VectorClosePriceField("Close", window_length),
+        VectorVolumeField("Volume", window_length),
+        VectorMovingAverageField("SMA10", window_length, 10),
+        VectorMovingAverageField("SMA30", window_length, 30),
+        VectorExponentialMovingAverageField("EMA10", window_length, 10),
+        VectorRSIField("RSI", window_length, 14),
+        VectorMACDField("MACD", window_length),
+        VectorVWAPField("VWAP", window_length),
+        VectorHighBBField("HighBB", window_length),
+        VectorLowBBField("LowBB", window_length),
+    ]:
+        market_data.add_field(field)
+
+    for symbol in stock_symbols:
+        market_data.register_symbol(symbol)
+
+    return market_data
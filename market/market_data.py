@@ -1,30 +1,322 @@
-from typing import List
+import threading
+import time
+from typing import Dict, List, Optional
 
 import numpy as np
 
 from market.data_field import DataFieldManager
-from sockets.bar_socket import GLOBAL_BAR_SOCKET
+from market.shared_state import SharedStateWriter
+from market.snapshot import node_id, pack_state, state_layout, unpack_state
+from shared import Bar, timestamp_ns
+from sockets.bar_socket import GLOBAL_BAR_SOCKET, BarSocket, BarSubscriber
+from sockets.instrumentation import Instrumentation
 
 
-class MarketData:
-    def __init__(self, window_length: int) -> None:
+class MarketData(BarSubscriber):
+    def __init__(
+        self, window_length: int, bar_socket: BarSocket = GLOBAL_BAR_SOCKET
+    ) -> None:
         self.window_length = window_length
+        self.bar_socket = bar_socket
         self.fields: List[DataFieldManager] = []
 
+        # every symbol's state matrix lives in one (symbols, window, fields)
+        # buffer. A row is rebuilt on read only after a new bar has arrived
+        # for its symbol.
+        self.rows: Dict[str, int] = {}  # maps a symbol to its row
+        self.states = np.zeros((0, window_length, 0))
+        self.stale = np.zeros(0, dtype=bool)
+
+        # timestamp of each symbol's latest bar in ns, 0 before the first
+        self.last_bar_ns = np.zeros(0, dtype=np.int64)
+
+        # held while a bar is applied and while cached rows are rebuilt or
+        # read, so snapshots and state reads never see half an update.
+        # Reentrant because update_bar refreshes rows for shared memory.
+        self.lock = threading.RLock()
+
+        # the distinct indicator graphs behind each symbol's fields, see graphs
+        self.symbol_graphs: Dict[str, list] = {}
+
+        # optional per-field latency recording, usually shared with the socket
+        self.instrumentation: Optional[Instrumentation] = None
+
+        # optional publication of every state row to other processes
+        self.shared: Optional[SharedStateWriter] = None
+
     def add_field(self, data_field_manager: DataFieldManager) -> None:
+        if self.shared is not None:
+            raise ValueError("Fields can't be added while shared memory is enabled")
+
         if self.window_length == data_field_manager.window_length:
             self.fields.append(data_field_manager)
-            GLOBAL_BAR_SOCKET.add_subscriber(data_field_manager)
+            self.symbol_graphs.clear()
+            self.states = np.zeros(
+                (len(self.rows), self.window_length, len(self.fields))
+            )
+            self.stale[:] = True
+            for symbol in data_field_manager.symbols():
+                self.__add_symbol(symbol)
         else:
             raise ValueError(
                 f"Window length of {self.window_length} does not match {data_field_manager.window_length} for {data_field_manager.name}"
             )
 
+    def register_symbol(self, symbol: str) -> None:
+        for field in self.fields:
+            field.register_symbol(symbol)
+        self.symbol_graphs.pop(symbol, None)
+        self.__add_symbol(symbol)
+
+    def __add_symbol(self, symbol: str) -> None:
+        if symbol in self.rows:
+            return
+
+        self.rows[symbol] = len(self.rows)
+        self.states = np.concatenate(
+            [self.states, np.zeros((1, self.window_length, len(self.fields)))]
+        )
+        self.stale = np.append(self.stale, True)
+        self.last_bar_ns = np.append(self.last_bar_ns, 0)
+        if self.shared is not None:
+            self.shared.add_symbol(symbol)
+
+        # the field managers are driven from here rather than subscribed
+        # directly, so the cached state can't go out of sync with them
+        self.bar_socket.add_subscriber(self, symbol)
+
+    def enable_instrumentation(
+        self, instrumentation: Optional[Instrumentation] = None
+    ) -> Instrumentation:
+        if instrumentation is None:
+            instrumentation = Instrumentation()
+        self.instrumentation = instrumentation
+        return instrumentation
+
+    def enable_shared_memory(
+        self, name: Optional[str] = None, capacity: Optional[int] = None
+    ) -> SharedStateWriter:
+        # publishes each symbol's state into a shared memory segment after
+        # every bar, read it from other processes with SharedStateReader(name).
+        # Fields have to be added first, capacity bounds the symbols that can
+        # be registered later.
+        if self.shared is not None:
+            return self.shared
+
+        self.shared = SharedStateWriter(
+            self.window_length,
+            [field.name for field in self.fields],
+            capacity or len(self.rows),
+            name,
+        )
+        with self.lock:
+            for symbol in self.rows:
+                self.shared.add_symbol(symbol)
+                self.shared.write(
+                    self.rows[symbol], self.states[self.__refresh(symbol)]
+                )
+        return self.shared
+
+    def disable_shared_memory(self) -> None:
+        if self.shared is not None:
+            self.shared.close()
+            self.shared = None
+
+    def update_bar(self, bar: Bar):
+        # The symbol's indicator graphs run once up front, the fields' own
+        # advance calls then only read them. That keeps the shared indicator
+        # work out of whichever field happens to come first, it is timed under
+        # "IndicatorGraph" instead.
+        with self.lock:
+            if self.instrumentation is not None:
+                start = time.perf_counter_ns()
+                for graph in self.graphs(bar.symbol):
+                    graph.advance(bar)
+                self.instrumentation.record(
+                    "IndicatorGraph", time.perf_counter_ns() - start
+                )
+
+                for_subscriber = self.instrumentation.for_subscriber
+                for field in self.fields:
+                    start = time.perf_counter_ns()
+                    field.update_bar(bar)
+                    for_subscriber(field).record(time.perf_counter_ns() - start)
+            else:
+                for graph in self.graphs(bar.symbol):
+                    graph.advance(bar)
+                for field in self.fields:
+                    field.update_bar(bar)
+
+            row = self.rows.get(bar.symbol)
+            if row is not None:
+                self.stale[row] = True
+                try:
+                    self.last_bar_ns[row] = timestamp_ns(bar.timestamp)
+                except (TypeError, ValueError):
+                    pass
+                if self.shared is not None:
+                    self.shared.write(row, self.states[self.__refresh(bar.symbol)])
+
+    def graphs(self, symbol: str) -> list:
+        # the distinct indicator graphs behind a symbol's fields, in field order
+        graphs = self.symbol_graphs.get(symbol)
+        if graphs is None:
+            graphs = []
+            for field in self.fields:
+                graph = field.data_fields[symbol].graph
+                if all(graph is not seen for seen in graphs):
+                    graphs.append(graph)
+            self.symbol_graphs[symbol] = graphs
+        return graphs
+
+    def state_objects(self, symbol: str) -> list:
+        # the fields and indicator nodes holding a symbol's state, in the
+        # order a snapshot packs them
+        objects = [field.data_fields[symbol] for field in self.fields]
+        for graph in self.graphs(symbol):
+            objects += graph.nodes.values()
+        return objects
+
+    def state_paths(self, symbol: str) -> List[str]:
+        # snapshot names of the objects state_objects returns
+        paths = [f"fields/{field.name}" for field in self.fields]
+        for i, graph in enumerate(self.graphs(symbol)):
+            paths += [f"graphs/{i}/{node_id(key)}" for key in graph.nodes]
+        return paths
+
+    def state_layout(self) -> Dict[str, np.ndarray]:
+        # the part of a snapshot describing how its state rows are packed,
+        # every symbol of a system is laid out the same way
+        paths, layouts = [], []
+        if self.rows:
+            symbol = next(iter(self.rows))
+            paths = self.state_paths(symbol)
+            layouts = [state_layout(obj) for obj in self.state_objects(symbol)]
+        return {
+            "objects": np.array(paths, dtype=str),
+            "layouts": np.array(layouts, dtype=str),
+            "window_length": np.array(self.window_length),
+        }
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        # state of every field and indicator graph, one packed float64 row per
+        # symbol. See market.snapshot for the layout and for saving it. The
+        # lock is taken per symbol so ingestion only waits for one symbol at a
+        # time.
+        with self.lock:
+            symbols = list(self.rows)
+            arrays = self.state_layout()
+
+        rows = []
+        last_bar_ns = np.zeros(len(symbols), dtype=np.int64)
+        for row, symbol in enumerate(symbols):
+            values: list = []
+            with self.lock:
+                for obj in self.state_objects(symbol):
+                    pack_state(obj, values)
+                last_bar_ns[row] = self.last_bar_ns[row]
+            rows.append(values)
+
+        state = np.array(rows, dtype=np.float64)
+        arrays["state"] = state.reshape(len(symbols), -1 if rows else 0)
+        arrays["symbols"] = np.array(symbols, dtype=str)
+        arrays["last_bar_ns"] = last_bar_ns
+        arrays["created_ns"] = np.array(time.time_ns())
+        return arrays
+
+    def restore(
+        self, arrays: Dict[str, np.ndarray], now=None, max_gap: float = 300
+    ) -> List[str]:
+        # Restores the symbols whose last snapshot bar is at most max_gap
+        # seconds older than now (a datetime, default the current time), the
+        # rest start empty as usual. A snapshot of differently configured
+        # fields or nodes is refused with a ValueError before anything is
+        # restored. Returns the restored symbols.
+        if not self.rows:
+            return []
+        self.__check_layout(arrays)
+
+        now_ns = time.time_ns() if now is None else timestamp_ns(now)
+        state = arrays["state"]
+
+        restored = []
+        with self.lock:
+            for i, symbol in enumerate(arrays["symbols"].tolist()):
+                row = self.rows.get(symbol)
+                last = int(arrays["last_bar_ns"][i])
+                if row is None or last == 0 or now_ns - last > max_gap * 1e9:
+                    continue
+
+                packed = state[i]
+                values = packed.tolist()
+                offset = 0
+                for obj in self.state_objects(symbol):
+                    offset = unpack_state(obj, packed, values, offset)
+
+                self.last_bar_ns[row] = last
+                self.stale[row] = True
+                if self.shared is not None:
+                    self.shared.write(row, self.states[self.__refresh(symbol)])
+                restored.append(symbol)
+
+        return restored
+
+    def __check_layout(self, arrays: Dict[str, np.ndarray]) -> None:
+        if "objects" not in arrays:
+            raise ValueError("Snapshot has no state layout, it predates this format")
+        if int(arrays["window_length"]) != self.window_length:
+            raise ValueError(
+                f"Snapshot window length {int(arrays['window_length'])} does not match {self.window_length}"
+            )
+
+        live = self.state_layout()
+        objects = live["objects"].tolist()
+        saved = arrays["objects"].tolist()
+        if saved != objects:
+            missing = sorted(set(objects) - set(saved))
+            unknown = sorted(set(saved) - set(objects))
+            raise ValueError(
+                f"Snapshot objects don't match, missing {missing}, unknown {unknown}"
+            )
+
+        for path, saved_layout, layout in zip(
+            objects, arrays["layouts"].tolist(), live["layouts"].tolist()
+        ):
+            if saved_layout != layout:
+                raise ValueError(
+                    f"Snapshot {path} is {saved_layout}, configured as {layout}"
+                )
+
+    def __refresh(self, symbol: str) -> int:
+        # callers hold self.lock, a bar can't land between the rebuild and
+        # clearing stale
+        assert symbol in self.rows, f"Symbol {symbol} not in market data"
+        row = self.rows[symbol]
+        if self.stale[row]:
+            # fields that are still warming up are zero padded at the front
+            state = self.states[row]
+            state[:] = 0
+            for i, field in enumerate(self.fields):
+                data = field.get_data(symbol)
+                state[self.window_length - len(data) :, i] = data
+            self.stale[row] = False
+
+        return row
+
     def state(self, symbol: str) -> np.ndarray:
-        # go through fields, arrange the data together
-        # return the data
+        # read only view into the cache, valid until the next bar for symbol
+        with self.lock:
+            view = self.states[self.__refresh(symbol)]
+        view.flags.writeable = False
+        return view
 
-        # here's the implementation:
-        ret = np.column_stack([field.get_data(symbol) for field in self.fields])
-        print(ret.shape)
-        return ret
+    def state_many(
+        self, symbols: List[str], out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        # (symbols, window, fields) copy in one contiguous array. Pass out to
+        # reuse a buffer between calls.
+        if out is None:
+            out = np.empty((len(symbols), self.window_length, len(self.fields)))
+        with self.lock:
+            rows = [self.__refresh(symbol) for symbol in symbols]
+            return np.take(self.states, rows, axis=0, out=out)
@@ -0,0 +1,52 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from market.market_data import MarketData
+
+
+class MultiTimeframeMarketData:
+    # Combines one MarketData per bar length. State is the (window, fields)
+    # matrices of every timeframe side by side, so a symbol's features span
+    # minutes to hours without keeping long raw windows.
+    def __init__(self, market_data: Dict[int, MarketData]) -> None:
+        window_lengths = {md.window_length for md in market_data.values()}
+        if len(window_lengths) != 1:
+            raise ValueError(
+                f"Timeframes need the same window length, got {sorted(window_lengths)}"
+            )
+
+        self.market_data = dict(sorted(market_data.items()))
+        self.window_length = window_lengths.pop()
+
+    def field_names(self) -> List[str]:
+        # column names of state(), e.g. "Close@5m"
+        return [
+            f"{field.name}@{minutes}m"
+            for minutes, md in self.market_data.items()
+            for field in md.fields
+        ]
+
+    def register_symbol(self, symbol: str) -> None:
+        for md in self.market_data.values():
+            md.register_symbol(symbol)
+
+    def state(self, symbol: str) -> np.ndarray:
+        # (window, fields of every timeframe). Longer timeframes are zero
+        # padded at the front until enough of their bars have closed.
+        return np.concatenate(
+            [md.state(symbol) for md in self.market_data.values()], axis=1
+        )
+
+    def state_many(
+        self, symbols: List[str], out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        if out is None:
+            out = np.empty((len(symbols), self.window_length, len(self.field_names())))
+
+        column = 0
+        for md in self.market_data.values():
+            width = len(md.fields)
+            out[:, :, column : column + width] = md.state_many(symbols)
+            column += width
+        return out
@@ -0,0 +1,130 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from shared import Bar
+from sockets.bar_socket import GLOBAL_BAR_SOCKET, BarSocket, BarSubscriber
+
+
+class PartialBar:
+    def __init__(self, bar: Bar, bucket) -> None:
+        self.bucket = bucket
+        self.bars = 1
+        self.open = bar.open
+        self.high = bar.high
+        self.low = bar.low
+        self.close = bar.close
+        self.volume = bar.volume
+        self.timestamp = bar.timestamp
+
+    def add(self, bar: Bar) -> None:
+        self.bars += 1
+        self.high = max(self.high, bar.high)
+        self.low = min(self.low, bar.low)
+        self.close = bar.close
+        self.volume += bar.volume
+
+
+class BarResampler(BarSubscriber):
+    # Builds `minutes` long bars from the 1 minute bars of an upstream socket
+    # and publishes them to its own subscribers, with the same subscribe
+    # interface as BarSocket so MarketData can sit behind it unchanged.
+    #
+    # Buckets are aligned to the clock, shifted by `offset` minutes (30 gives
+    # hourly bars starting at the 9:30 open). A bar is published as soon as
+    # the last minute of its bucket arrives, or when a later bucket starts if
+    # minutes were missing. Bars without a datetime timestamp are grouped by
+    # count instead.
+    def __init__(
+        self, minutes: int, bar_socket: BarSocket = GLOBAL_BAR_SOCKET, offset: int = 0
+    ) -> None:
+        self.minutes = minutes
+        self.offset = offset
+        self.bar_socket = bar_socket
+
+        self.partials: Dict[str, PartialBar] = {}
+        self.counts: Dict[str, int] = {}  # bars seen per symbol, for count mode
+
+        self.subscribers: Dict[str, List[BarSubscriber]] = {}
+        self.wildcard_subscribers: List[BarSubscriber] = []
+
+    def add_subscriber(self, subscriber, symbol: Optional[str] = None):
+        if symbol is None:
+            if not self.wildcard_subscribers:
+                # every symbol comes through the wildcard from now on
+                for routed in self.subscribers:
+                    self.bar_socket.remove_subscriber(self, routed)
+                self.bar_socket.add_subscriber(self)
+            self.wildcard_subscribers.append(subscriber)
+            return
+
+        if symbol not in self.subscribers and not self.wildcard_subscribers:
+            self.bar_socket.add_subscriber(self, symbol)
+        self.subscribers.setdefault(symbol, []).append(subscriber)
+
+    def remove_subscriber(self, subscriber, symbol: Optional[str] = None):
+        if symbol is None:
+            self.wildcard_subscribers.remove(subscriber)
+            if not self.wildcard_subscribers:
+                self.bar_socket.remove_subscriber(self)
+                for routed in self.subscribers:
+                    self.bar_socket.add_subscriber(self, routed)
+            return
+
+        subs = self.subscribers.get(symbol, [])
+        subs.remove(subscriber)
+        if len(subs) == 0:
+            del self.subscribers[symbol]
+            if not self.wildcard_subscribers:
+                self.bar_socket.remove_subscriber(self, symbol)
+
+    def __bucket(self, bar: Bar):
+        # (bucket id, whether this bar closes the bucket)
+        if isinstance(bar.timestamp, datetime):
+            minute = bar.timestamp.hour * 60 + bar.timestamp.minute - self.offset
+            bucket = (bar.timestamp.date(), minute // self.minutes)
+            return bucket, minute % self.minutes == self.minutes - 1
+
+        count = self.counts.get(bar.symbol, 0)
+        self.counts[bar.symbol] = count + 1
+        return count // self.minutes, count % self.minutes == self.minutes - 1
+
+    def update_bar(self, bar: Bar):
+        bucket, last = self.__bucket(bar)
+        partial = self.partials.get(bar.symbol)
+
+        if partial is not None and partial.bucket != bucket:
+            # minutes were missing at the end of the previous bucket
+            self.__emit(bar.symbol)
+            partial = None
+
+        if partial is None:
+            self.partials[bar.symbol] = PartialBar(bar, bucket)
+        else:
+            partial.add(bar)
+
+        if last:
+            self.__emit(bar.symbol)
+
+    def flush(self, symbol: Optional[str] = None) -> None:
+        # publishes unfinished bars, e.g. at the end of a session
+        symbols = list(self.partials) if symbol is None else [symbol]
+        for symbol in symbols:
+            if symbol in self.partials:
+                self.__emit(symbol)
+
+    def __emit(self, symbol: str) -> None:
+        partial = self.partials.pop(symbol)
+        bar = Bar(
+            symbol,
+            partial.open,
+            partial.high,
+            partial.low,
+            partial.close,
+            partial.volume,
+            partial.timestamp,
+        )
+
+        for sub in self.subscribers.get(symbol, ()):
+            sub.update_bar(bar)
+        for sub in self.wildcard_subscribers:
+            sub.update_bar(bar)
@@ -0,0 +1,86 @@
+import numpy as np
+
+
+class RingBuffer:
+    # snapshot state and configuration, see market.snapshot
+    STATE = {"buffer": np.ndarray, "head": int, "count": int}
+    CONFIG = ("capacity",)
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+
+        # every value is written twice, at i and i + capacity, so the stored
+        # window is always one contiguous slice of the array
+        self.buffer = np.zeros(2 * capacity, dtype=np.float64)
+        self.head = 0  # index of the next write
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> float:
+        if index < 0:
+            index += self.count
+        if index < 0 or index >= self.count:
+            raise IndexError("RingBuffer index out of range")
+        return self.buffer[self.head + self.capacity - self.count + index]
+
+    def append(self, value: float) -> None:
+        self.buffer[self.head] = value
+        self.buffer[self.head + self.capacity] = value
+
+        self.head += 1
+        if self.head == self.capacity:
+            self.head = 0
+        if self.count < self.capacity:
+            self.count += 1
+
+    def values(self) -> np.ndarray:
+        # view of the stored values, oldest first. Only valid until the next
+        # append, copy it if it needs to outlive that.
+        end = self.head + self.capacity
+        return self.buffer[end - self.count : end]
+
+
+class RingMatrix:
+    # one ring buffer per row, each row with its own head so rows can be
+    # appended to independently of each other
+    def __init__(self, rows: int, capacity: int):
+        self.capacity = capacity
+        self.buffer = np.zeros((rows, capacity), dtype=np.float64)
+        self.head = np.zeros(rows, dtype=np.int64)
+        self.count = np.zeros(rows, dtype=np.int64)
+
+    def add_rows(self, rows: int) -> None:
+        self.buffer = np.vstack([self.buffer, np.zeros((rows, self.capacity))])
+        self.head = np.concatenate([self.head, np.zeros(rows, dtype=np.int64)])
+        self.count = np.concatenate([self.count, np.zeros(rows, dtype=np.int64)])
+
+    def append(self, rows: np.ndarray, values: np.ndarray) -> None:
+        # rows must not contain duplicates
+        head = self.head[rows]
+        self.buffer[rows, head] = values
+        self.head[rows] = (head + 1) % self.capacity
+        self.count[rows] = np.minimum(self.count[rows] + 1, self.capacity)
+
+    def get(self, rows: np.ndarray, index: int) -> np.ndarray:
+        # deque-style index into each row, negative from the newest value.
+        # Rows holding fewer than abs(index) values return garbage, callers
+        # mask those out.
+        if index < 0:
+            positions = self.head[rows] + index
+        else:
+            positions = self.head[rows] - self.count[rows] + index
+        return self.buffer[rows, positions % self.capacity]
+
+    def filled(self, rows: np.ndarray) -> np.ndarray:
+        # mask of the buffer slots that hold a value
+        return np.arange(self.capacity) < self.count[rows][:, None]
+
+    def ordered(self, rows: np.ndarray) -> np.ndarray:
+        # (rows, capacity) copy, oldest first. Rows that aren't full yet come
+        # out zero padded at the front.
+        positions = (
+            self.head[rows][:, None] + np.arange(self.capacity)
+        ) % self.capacity
+        return self.buffer[rows[:, None], positions]
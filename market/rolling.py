@@ -0,0 +1,99 @@
+from market.ring_buffer import RingBuffer
+
+
+class RollingSum:
+    STATE = {
+        "values": RingBuffer,
+        "total": float,
+        "nonzero": int,
+        "appends_since_resync": int,
+    }
+    CONFIG = ()
+
+    def __init__(self, capacity: int):
+        self.values = RingBuffer(capacity)
+        self.total = 0.0
+
+        # number of non-zero values in the window, lets the sum snap back to
+        # exactly zero instead of carrying rounding residue
+        self.nonzero = 0
+
+        # the running total is recomputed from the window once per capacity
+        # appends so rounding error can't build up (amortized O(1))
+        self.appends_since_resync = 0
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def append(self, value: float) -> None:
+        if len(self.values) == self.values.capacity:
+            old = self.values[0]
+            self.total -= old
+            if old != 0:
+                self.nonzero -= 1
+
+        self.values.append(value)
+        self.total += value
+        if value != 0:
+            self.nonzero += 1
+
+        self.appends_since_resync += 1
+        if self.nonzero == 0:
+            self.total = 0.0
+        elif self.appends_since_resync >= self.values.capacity:
+            self.total = float(self.values.values().sum())
+            self.appends_since_resync = 0
+
+
+class RollingVariance:
+    STATE = {
+        "values": RingBuffer,
+        "mean": float,
+        "m2": float,
+        "appends_since_resync": int,
+    }
+    CONFIG = ()
+
+    def __init__(self, capacity: int):
+        self.values = RingBuffer(capacity)
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared deviations from the mean
+        self.appends_since_resync = 0
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def append(self, value: float) -> None:
+        n = len(self.values)
+
+        if n < self.values.capacity:
+            # Welford's update while the window is still filling
+            n += 1
+            delta = value - self.mean
+            self.mean += delta / n
+            self.m2 += delta * (value - self.mean)
+        else:
+            # sliding window: swap the oldest value out in one step
+            old = self.values[0]
+            new_mean = self.mean + (value - old) / n
+            self.m2 += (value - old) * (value - new_mean + old - self.mean)
+            self.mean = new_mean
+
+        self.values.append(value)
+
+        self.appends_since_resync += 1
+        if self.appends_since_resync >= self.values.capacity:
+            window = self.values.values()
+            self.mean = float(window.mean())
+            self.m2 = float(((window - self.mean) ** 2).sum())
+            self.appends_since_resync = 0
+
+    def variance(self) -> float:
+        # population variance, same as np.var / np.std defaults
+        n = len(self.values)
+        if n == 0:
+            return 0.0
+        return max(self.m2, 0.0) / n
+
+    def std(self) -> float:
+        return self.variance() ** 0.5
@@ -0,0 +1,187 @@
+import multiprocessing
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from market.initialize import initialize_market_data_system
+from shared import Bar
+from sockets.bar_socket import GLOBAL_BAR_SOCKET, BarSocket, BarSubscriber
+
+
+def shard_for(symbol: str, shards: int) -> int:
+    # crc32 rather than hash() so the mapping is the same in every process
+    return zlib.crc32(symbol.encode()) % shards
+
+
+def _run_shard(
+    conn,
+    symbols: List[str],
+    window_length: int,
+    params: Optional[Dict[str, int]],
+) -> None:
+    # Worker process: owns a private bar socket and a full market data system
+    # for its symbols, and serves requests from the router in order. Bars
+    # aren't acknowledged, so a state request always sees every bar that was
+    # sent before it.
+    bar_socket = BarSocket()
+    try:
+        market_data = initialize_market_data_system(
+            symbols, bar_socket, window_length, params
+        )
+    except Exception as e:
+        # e.g. bad params, raised again by the router
+        conn.send(e)
+        conn.close()
+        return
+    conn.send([field.name for field in market_data.fields])
+
+    while True:
+        message = conn.recv()
+        kind = message[0]
+
+        if kind == "bars":
+            for values in message[1]:
+                bar_socket.publish(Bar(*values))
+        elif kind == "state":
+            conn.send(market_data.state_many(message[1]))
+        elif kind == "register":
+            market_data.register_symbol(message[1])
+        elif kind == "stop":
+            conn.close()
+            return
+
+
+class ShardedMarketData(BarSubscriber):
+    # Same reads as MarketData, with symbols partitioned across worker
+    # processes by hash. Bars are routed to the owning shard in batches and
+    # state reads gather from the shards that own the requested symbols.
+    def __init__(
+        self,
+        stock_symbols: List[str],
+        shards: Optional[int] = None,
+        batch_size: int = 256,
+        bar_socket: BarSocket = GLOBAL_BAR_SOCKET,
+        window_length: int = 10,
+        params: Optional[Dict[str, int]] = None,
+    ) -> None:
+        self.shards = shards or multiprocessing.cpu_count()
+        self.batch_size = batch_size
+        self.bar_socket = bar_socket
+        self.window_length = window_length
+        self.params = params
+
+        self.owners: Dict[str, int] = {}
+        assigned: List[List[str]] = [[] for _ in range(self.shards)]
+        for symbol in stock_symbols:
+            shard = shard_for(symbol, self.shards)
+            self.owners[symbol] = shard
+            assigned[shard].append(symbol)
+
+        # spawn so the workers don't inherit the parent's socket and journal
+        # threads
+        context = multiprocessing.get_context("spawn")
+        self.conns = []
+        self.processes = []
+        for symbols in assigned:
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_run_shard,
+                args=(child_conn, symbols, window_length, params),
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self.conns.append(parent_conn)
+            self.processes.append(process)
+
+        # every shard runs the same fields, which also size state reads
+        replies = [conn.recv() for conn in self.conns]
+        for reply in replies:
+            if isinstance(reply, Exception):
+                for conn, other in zip(self.conns, replies):
+                    if not isinstance(other, Exception):
+                        conn.send(("stop",))
+                for process in self.processes:
+                    process.join()
+                for conn in self.conns:
+                    conn.close()
+                raise reply
+        self.field_names: List[str] = replies[0]
+
+        # bars waiting to be sent, one batch per shard
+        self.pending: List[list] = [[] for _ in range(self.shards)]
+
+        for symbol in stock_symbols:
+            bar_socket.add_subscriber(self, symbol)
+
+    def register_symbol(self, symbol: str) -> None:
+        if symbol in self.owners:
+            return
+
+        shard = shard_for(symbol, self.shards)
+        self.owners[symbol] = shard
+        self.conns[shard].send(("register", symbol))
+        self.bar_socket.add_subscriber(self, symbol)
+
+    def update_bar(self, bar: Bar):
+        shard = self.owners.get(bar.symbol)
+        if shard is None:
+            return
+
+        # plain tuples pickle much faster than the Bar dataclass
+        batch = self.pending[shard]
+        batch.append(
+            (
+                bar.symbol,
+                bar.open,
+                bar.high,
+                bar.low,
+                bar.close,
+                bar.volume,
+                bar.timestamp,
+            )
+        )
+        if len(batch) >= self.batch_size:
+            self.__send(shard)
+
+    def __send(self, shard: int) -> None:
+        if self.pending[shard]:
+            self.conns[shard].send(("bars", self.pending[shard]))
+            self.pending[shard] = []
+
+    def flush(self) -> None:
+        for shard in range(self.shards):
+            self.__send(shard)
+
+    def state(self, symbol: str) -> np.ndarray:
+        return self.state_many([symbol])[0]
+
+    def state_many(
+        self, symbols: List[str], out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        # (symbols, window, fields), in the order asked for
+        by_shard: Dict[int, List[int]] = {}
+        for i, symbol in enumerate(symbols):
+            assert symbol in self.owners, f"Symbol {symbol} not in market data"
+            by_shard.setdefault(self.owners[symbol], []).append(i)
+
+        # every shard is asked before any reply is read so they work at once
+        for shard, indices in by_shard.items():
+            self.__send(shard)
+            self.conns[shard].send(("state", [symbols[i] for i in indices]))
+
+        if out is None:
+            out = np.empty((len(symbols), self.window_length, len(self.field_names)))
+        for shard, indices in by_shard.items():
+            out[indices] = self.conns[shard].recv()
+        return out
+
+    def close(self) -> None:
+        for shard, conn in enumerate(self.conns):
+            self.__send(shard)
+            conn.send(("stop",))
+        for process in self.processes:
+            process.join()
+        for conn in self.conns:
+            conn.close()
@@ -0,0 +1,186 @@
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Segment layout, everything 8 byte aligned:
+#   header      int64[5]             magic, capacity, window, fields, symbols
+#   symbols     S16[capacity]        symbol of each row
+#   field names S16[fields]
+#   seq         int64[capacity]      seqlock per row, odd while being written
+#   data        float64[capacity, window, fields]
+MAGIC = 0x42524541445354  # "BREADST"
+NAME_BYTES = 16
+HEADER_WORDS = 5
+
+# segments created by writers in this process
+_created = set()
+
+
+def _layout(capacity: int, window_length: int, fields: int):
+    symbols_at = HEADER_WORDS * 8
+    names_at = symbols_at + capacity * NAME_BYTES
+    seq_at = names_at + fields * NAME_BYTES
+    data_at = seq_at + capacity * 8
+    size = data_at + capacity * window_length * fields * 8
+    return symbols_at, names_at, seq_at, data_at, size
+
+
+class _Segment:
+    def __init__(self, shm: shared_memory.SharedMemory) -> None:
+        self.shm = shm
+        self.header = np.ndarray((HEADER_WORDS,), np.int64, shm.buf)
+        assert self.header[0] == MAGIC, f"{shm.name} is not a market data segment"
+
+        capacity, window_length, fields = (int(v) for v in self.header[1:4])
+        symbols_at, names_at, seq_at, data_at, _ = _layout(
+            capacity, window_length, fields
+        )
+        self.capacity = capacity
+        self.window_length = window_length
+        self.symbols = np.ndarray((capacity,), f"S{NAME_BYTES}", shm.buf, symbols_at)
+        self.field_names = np.ndarray((fields,), f"S{NAME_BYTES}", shm.buf, names_at)
+        self.seq = np.ndarray((capacity,), np.int64, shm.buf, seq_at)
+        self.data = np.ndarray(
+            (capacity, window_length, fields), np.float64, shm.buf, data_at
+        )
+
+    def release(self) -> None:
+        # the arrays hold exports of the buffer, which has to be released
+        # before the segment can be closed
+        del self.header, self.symbols, self.field_names, self.seq, self.data
+        self.shm.close()
+
+
+class SharedStateWriter:
+    # Publishes MarketData state rows into a shared memory segment. Each row
+    # is guarded by a seqlock: the counter is odd while the row is being
+    # written, so readers can tell a torn copy from a consistent one without
+    # any locking on the writer's side.
+    def __init__(
+        self,
+        window_length: int,
+        field_names: List[str],
+        capacity: int,
+        name: Optional[str] = None,
+    ) -> None:
+        # checked before the segment exists so a bad name doesn't leak it
+        for field in field_names:
+            if len(field.encode()) > NAME_BYTES:
+                raise ValueError(f"Field {field} is longer than {NAME_BYTES} bytes")
+
+        *_, size = _layout(capacity, window_length, len(field_names))
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_WORDS,), np.int64, shm.buf)
+        header[:] = [MAGIC, capacity, window_length, len(field_names), 0]
+        del header
+
+        self.segment = _Segment(shm)
+        self.segment.field_names[:] = [field.encode() for field in field_names]
+        self.name = shm.name
+        self.rows: Dict[str, int] = {}
+        _created.add(shm._name)  # type: ignore
+
+    def add_symbol(self, symbol: str) -> int:
+        if symbol in self.rows:
+            return self.rows[symbol]
+
+        row = len(self.rows)
+        if row >= self.segment.capacity:
+            raise ValueError(
+                f"Shared segment {self.name} is full at {self.segment.capacity} symbols"
+            )
+        if len(symbol.encode()) > NAME_BYTES:
+            raise ValueError(f"Symbol {symbol} is longer than {NAME_BYTES} bytes")
+
+        self.segment.symbols[row] = symbol.encode()
+        self.rows[symbol] = row
+        # published last so readers never see a row without its symbol
+        self.segment.header[4] = row + 1
+        return row
+
+    def write(self, row: int, state: np.ndarray) -> None:
+        seq = self.segment.seq
+        seq[row] += 1
+        self.segment.data[row] = state
+        seq[row] += 1
+
+    def close(self) -> None:
+        shm = self.segment.shm
+        self.segment.release()
+        shm.unlink()
+        _created.discard(shm._name)  # type: ignore
+
+
+class SharedStateReader:
+    # Attaches to a segment published by MarketData.enable_shared_memory from
+    # any process on the host
+    def __init__(self, name: str, max_retries: int = 1000) -> None:
+        shm = shared_memory.SharedMemory(name=name)
+        # the writer owns the segment, without this the resource tracker of
+        # this process would unlink it on exit
+        if shm._name not in _created:  # type: ignore
+            resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore
+
+        self.segment = _Segment(shm)
+        self.name = name
+        self.max_retries = max_retries
+        self.field_names = [
+            field.decode() for field in self.segment.field_names.tolist()
+        ]
+        self.rows: Dict[str, int] = {}
+
+    def __row(self, symbol: str) -> int:
+        row = self.rows.get(symbol)
+        if row is None:
+            # symbols can be added after this reader attached
+            count = int(self.segment.header[4])
+            for i in range(len(self.rows), count):
+                self.rows[self.segment.symbols[i].decode()] = i
+            row = self.rows.get(symbol)
+            assert row is not None, f"Symbol {symbol} not in {self.name}"
+        return row
+
+    def view(self, symbol: str) -> np.ndarray:
+        # zero copy, may be torn by a concurrent write. Pair with version()
+        # before and after reading to detect that.
+        view = self.segment.data[self.__row(symbol)]
+        view.flags.writeable = False
+        return view
+
+    def version(self, symbol: str) -> int:
+        # even when the row is stable, bumps by two per publish
+        return int(self.segment.seq[self.__row(symbol)])
+
+    def state(self, symbol: str, out: Optional[np.ndarray] = None) -> np.ndarray:
+        # consistent copy of a symbol's (window, fields) matrix
+        row = self.__row(symbol)
+        seq = self.segment.seq
+        data = self.segment.data
+        if out is None:
+            out = np.empty(data.shape[1:])
+
+        for _ in range(self.max_retries):
+            before = seq[row]
+            if before & 1:
+                # mid write, give the writer a chance to finish
+                time.sleep(0)
+                continue
+            out[:] = data[row]
+            if seq[row] == before:
+                return out
+
+        raise RuntimeError(f"Could not get a consistent read of {symbol}")
+
+    def state_many(
+        self, symbols: List[str], out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        if out is None:
+            out = np.empty((len(symbols),) + self.segment.data.shape[1:])
+        for i, symbol in enumerate(symbols):
+            self.state(symbol, out[i])
+        return out
+
+    def close(self) -> None:
+        self.segment.release()
@@ -1,10 +1,19 @@
 from abc import ABC
-from collections import deque
-from math import log
+from typing import Optional
 
 import numpy as np
 
 from market.data_field import DataField
+from market.indicator_graph import (
+    BollingerNode,
+    EMANode,
+    IndicatorGraph,
+    MACDNode,
+    RSINode,
+    SMANode,
+    VWAPNode,
+)
+from market.ring_buffer import RingBuffer
 from shared import Bar
 
 # High bollinger band
@@ -13,26 +22,24 @@ from shared import Bar
 
 
 class LogReturnField(DataField, ABC):
-    def __init__(self, name: str, window_length: int):
-        super().__init__(name, window_length)
+    STATE = {"data": RingBuffer, "log_ref": RingBuffer}
 
-        self.log_ref = deque(maxlen=window_length)
-        self.data = deque(maxlen=window_length)
+    def __init__(
+        self, name: str, window_length: int, graph: Optional[IndicatorGraph] = None
+    ):
+        super().__init__(name, window_length, graph)
+
+        self.log_ref = RingBuffer(window_length)
+        self.data = RingBuffer(window_length)
 
     def get_data(self):
+        # log returns against the oldest reference, zero padded at the front
+        log_returns = np.zeros(self.window_length)
         current_length = len(self.data)
         if current_length > 0:
-            base = self.log_ref[0]
-            log_returns = [log(x / base) for x in self.data]
-        else:
-            log_returns = []
-
-        # Padding with zeros if needed
-        padding_length = self.window_length - current_length
-        if padding_length > 0:
-            log_returns = [0.0] * padding_length + log_returns
+            log_returns[-current_length:] = np.log(self.data.values() / self.log_ref[0])
 
-        return np.array(log_returns)
+        return log_returns
 
     def add_entry(self, value: float, ref: float = 0):
         # TODO: make this log return field work
@@ -70,168 +77,158 @@ class VolumeField(LogReturnField):
 
 
 class MovingAverageField(LogReturnField):
-    def __init__(self, name: str, window_length: int, period: int):
-        super().__init__(name, window_length)
+    CONFIG = ("window_length", "period")
+
+    def __init__(
+        self,
+        name: str,
+        window_length: int,
+        period: int,
+        graph: Optional[IndicatorGraph] = None,
+    ):
+        super().__init__(name, window_length, graph)
 
         self.period = period
+        self.sma = self.graph.node(SMANode, period)
 
     def update(self, bar: Bar):
-        close = bar.close
-        cur_len = len(self.data)
-
-        if cur_len == 0:
-            new_ma = close
-        elif cur_len < self.period:
-            new_ma = self.data[-1] * (cur_len / (cur_len + 1)) + close / (cur_len + 1)
-        else:
-            new_ma = self.data[-1] + (close - self.data[-self.period]) / self.period
-
-        self.add_entry(new_ma)
+        self.graph.advance(bar)
+        self.add_entry(self.sma.value)
 
 
 class ExponentialMovingAverageField(LogReturnField):
-    def __init__(self, name: str, window_length: int, period: int):
-        super().__init__(name, window_length)
+    CONFIG = ("window_length", "period")
+
+    def __init__(
+        self,
+        name: str,
+        window_length: int,
+        period: int,
+        graph: Optional[IndicatorGraph] = None,
+    ):
+        super().__init__(name, window_length, graph)
 
         self.period = period
-        self.multiplier = 2 / (period + 1)
+        self.ema = self.graph.node(EMANode, period)
 
     def update(self, bar: Bar):
-        close = bar.close
-        cur_len = len(self.data)
-
-        if cur_len == 0:
-            new_ma = close
-        else:
-            new_ma = self.data[-1] * (1 - self.multiplier) + close * self.multiplier
-
-        self.add_entry(new_ma)
+        self.graph.advance(bar)
+        self.add_entry(self.ema.value)
 
 
 class RSIField(DataField):
-    def __init__(self, name: str, window_length: int, periods: int = 14):
-        super().__init__(name, window_length)
+    STATE = {"data": RingBuffer}
 
-        self.diffs = deque(maxlen=periods)
-        self.prev_price = 0
-        self.data = deque(maxlen=window_length)
+    def __init__(
+        self,
+        name: str,
+        window_length: int,
+        periods: int = 14,
+        graph: Optional[IndicatorGraph] = None,
+    ):
+        super().__init__(name, window_length, graph)
 
-        pass
+        self.rsi = self.graph.node(RSINode, periods)
+        self.data = RingBuffer(window_length)
 
     def get_data(self) -> np.ndarray:
-        return np.array(self.data)
+        return self.data.values().copy()
 
     def update(self, bar: Bar):
-        close = bar.close
-
-        if len(self.data) == 0:
-            self.data.append(50)
-            self.prev_price = close
-            self.diffs.append(0)
-            return
-
-        diff = close - self.prev_price
-        self.diffs.append(diff)
-
-        self.prev_price = close
-
-        avg_gain = sum([x for x in self.diffs if x > 0]) / len(self.diffs)
-        avg_loss = abs(sum([x for x in self.diffs if x < 0])) / len(self.diffs)
-
-        if avg_loss == 0:
-            if avg_gain == 0:
-                rsi = 50  # Neutral RSI when there's no gain or loss
-            else:
-                rsi = 100  # Max RSI when there's gain and no loss
-        else:
-            rs = avg_gain / avg_loss
-            rsi = 100 - (100 / (1 + rs))
-
-        self.data.append(rsi)
+        self.graph.advance(bar)
+        self.data.append(self.rsi.value)
 
 
 class MACDFIeld(DataField):
-    def __init__(self, name, window_length):
-        super().__init__(name, window_length)
+    STATE = {"data": RingBuffer}
+
+    def __init__(
+        self,
+        name,
+        window_length,
+        short: int = 12,
+        long: int = 26,
+        graph: Optional[IndicatorGraph] = None,
+    ):
+        super().__init__(name, window_length, graph)
 
-        self.short_ema = ExponentialMovingAverageField("short_ema", window_length, 12)
-        self.long_ema = ExponentialMovingAverageField("long_ema", window_length, 26)
+        self.macd = self.graph.node(MACDNode, short, long)
 
-        self.data = deque(maxlen=window_length)  # MACD value, divided by stock price
+        self.data = RingBuffer(window_length)  # MACD value, divided by stock price
 
     def short_ema_price(self):
-        return self.short_ema.data[-1]
+        return self.macd.short_ema.value
 
     def long_ema_price(self):
-        return self.long_ema.data[-1]
+        return self.macd.long_ema.value
 
     def get_data(self) -> np.ndarray:
-        return np.array(self.data)
+        return self.data.values().copy()
 
     def update(self, bar: Bar):
-        close = bar.close
-
-        self.short_ema.update(bar)
-        self.long_ema.update(bar)
-
-        macd = self.short_ema_price() - self.long_ema_price()
-        self.data.append(100 * macd / close)
+        self.graph.advance(bar)
+        self.data.append(100 * self.macd.value / bar.close)
 
 
 class VWAPField(LogReturnField):
-    def __init__(self, name, window_length, period: int = 60):
-        super().__init__(name, window_length)
+    CONFIG = ("window_length", "period")
+
+    def __init__(
+        self,
+        name,
+        window_length,
+        period: int = 60,
+        graph: Optional[IndicatorGraph] = None,
+    ):
+        super().__init__(name, window_length, graph)
 
         self.period = period
-        self.volumes = deque(maxlen=period)
-        self.closes = deque(maxlen=period)
+        self.vwap = self.graph.node(VWAPNode, period)
 
     def update(self, bar: Bar):
-        close = bar.close
-        volume = bar.volume
-
-        self.volumes.append(volume)
-        self.closes.append(close)
-        current_vwap = sum([x * y for x, y in zip(self.volumes, self.closes)]) / sum(
-            self.volumes
-        )
-        self.add_entry(current_vwap)
+        self.graph.advance(bar)
+        self.add_entry(self.vwap.value)
 
 
 class HighBBField(LogReturnField):
-    def __init__(self, name: str, window_length: int):
-        super().__init__(name, window_length)
+    def __init__(
+        self,
+        name: str,
+        window_length: int,
+        period: int = 20,
+        graph: Optional[IndicatorGraph] = None,
+    ):
+        super().__init__(name, window_length, graph)
 
-        self.sma = MovingAverageField("", 20, 20)
-        self.std_dev = 0
+        self.bands = self.graph.node(BollingerNode, period)
 
     def update(self, bar: Bar):
-        close = bar.close
-
-        self.sma.update(bar)
+        self.graph.advance(bar)
         if len(self.data) < self.window_length:
-            self.data.append(close)
+            self.add_entry(bar.close)
             return
 
-        std_dev = np.std(self.sma.data)
-        upper_band = self.sma.data[-1] + 2 * std_dev
+        upper_band = self.bands.value + 2 * self.bands.std
         self.add_entry(upper_band)
 
 
 class LowBBField(LogReturnField):
-    def __init__(self, name: str, window_length: int):
-        super().__init__(name, window_length)
+    def __init__(
+        self,
+        name: str,
+        window_length: int,
+        period: int = 20,
+        graph: Optional[IndicatorGraph] = None,
+    ):
+        super().__init__(name, window_length, graph)
 
-        self.sma = MovingAverageField("", 20, 20)
+        self.bands = self.graph.node(BollingerNode, period)
 
     def update(self, bar: Bar):
-        close = bar.close
-
-        self.sma.update(bar)
+        self.graph.advance(bar)
         if len(self.data) < self.window_length:
-            self.data.append(close)
+            self.add_entry(bar.close)
             return
 
-        std_dev = np.std(self.sma.data)
-        lower_band = self.sma.data[-1] - 2 * std_dev
+        lower_band = self.bands.value - 2 * self.bands.std
         self.add_entry(lower_band)
@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# A snapshot holds the mutable state of a market data system's fields and
+# indicator nodes. Every class taking part declares it explicitly:
+#   STATE   attribute -> int, float, np.ndarray or a class with its own STATE,
+#           in the order the state is packed
+#   CONFIG  attributes that configure the object (periods, capacities). They
+#           are never restored, a snapshot taken with other values is refused.
+# One symbol's state is packed into a single float64 row, objects one after
+# the other in the order MarketData.state_objects lists them.
+
+
+def pack_state(obj, out: list) -> None:
+    # appends obj's state to out as python numbers
+    for name, kind in obj.STATE.items():
+        value = getattr(obj, name)
+        if kind is np.ndarray:
+            out.extend(value.tolist())
+        elif kind is int or kind is float:
+            out.append(value)
+        else:
+            pack_state(value, out)
+
+
+def unpack_state(obj, row: np.ndarray, values: list, i: int) -> int:
+    # inverse of pack_state from offset i of a packed row, values being the
+    # row as a list. Arrays are written in place so views and references to
+    # them stay valid. Returns the offset after obj's state.
+    attributes = vars(obj)
+    for name, kind in obj.STATE.items():
+        if kind is float:
+            attributes[name] = values[i]
+            i += 1
+        elif kind is int:
+            attributes[name] = int(values[i])
+            i += 1
+        elif kind is np.ndarray:
+            array = attributes[name]
+            n = array.size
+            array[...] = row[i : i + n]
+            i += n
+        else:
+            i = unpack_state(attributes[name], row, values, i)
+    return i
+
+
+def pack_columns(
+    obj, columns: Dict[str, np.ndarray], symbols: int, prefix: str = ""
+) -> List[np.ndarray]:
+    # pack_state for many symbols at once from (symbols, ...) arrays keyed by
+    # attribute path, e.g. "data.buffer". State missing from columns takes
+    # obj's current value for every symbol.
+    blocks = []
+    for name, kind in obj.STATE.items():
+        path = prefix + name
+        if kind is np.ndarray or kind is int or kind is float:
+            value = columns.get(path)
+            if value is None:
+                value = np.repeat([getattr(obj, name)], symbols, axis=0)
+            blocks.append(np.reshape(value, (symbols, -1)).astype(np.float64))
+        else:
+            blocks += pack_columns(getattr(obj, name), columns, symbols, path + ".")
+    return blocks
+
+
+def state_layout(obj) -> str:
+    # class, configuration and nested state of obj, two objects with the same
+    # layout pack the same state the same way
+    config = ", ".join(f"{name}={getattr(obj, name)!r}" for name in obj.CONFIG)
+    nested = "".join(
+        f" {name}=[{state_layout(getattr(obj, name))}]"
+        for name, kind in obj.STATE.items()
+        if kind not in (int, float, np.ndarray)
+    )
+    return f"{type(obj).__name__}({config}){nested}"
+
+
+def node_id(key: tuple) -> str:
+    node_class, *params = key
+    return f"{node_class.__name__}{tuple(params)}"
+
+
+def save_snapshot(arrays: Dict[str, np.ndarray], path: str) -> None:
+    # uncompressed npz, written then renamed so a crash mid-write never
+    # leaves a truncated checkpoint behind
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path + ".tmp", "wb") as file:
+        np.savez(file, **arrays)
+    os.replace(path + ".tmp", path)
+
+
+def load_snapshot(path: str) -> Dict[str, np.ndarray]:
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+
+class Checkpointer:
+    # Saves a market data system's snapshot every `interval` seconds from a
+    # background thread, and once more on stop
+    def __init__(self, market_data, path: str, interval: float = 60) -> None:
+        self.market_data = market_data
+        self.path = path
+        self.interval = interval
+        self.stop_flag = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.saved = 0
+        self.last_seconds = 0.0
+
+    def checkpoint(self) -> None:
+        start = time.perf_counter()
+        save_snapshot(self.market_data.snapshot(), self.path)
+        self.last_seconds = time.perf_counter() - start
+        self.saved += 1
+
+    def _run_thread(self) -> None:
+        while not self.stop_flag.wait(self.interval):
+            try:
+                self.checkpoint()
+            except Exception as e:
+                print("Error writing checkpoint: ", e)
+
+    def start(self) -> None:
+        if self.thread is not None:
+            return
+
+        self.stop_flag.clear()
+        self.thread = threading.Thread(target=self._run_thread, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        if self.thread is None:
+            return
+
+        self.stop_flag.set()
+        self.thread.join()
+        self.thread = None
+        self.checkpoint()
@@ -0,0 +1,180 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+
+from shared import Bar
+from sockets.bar_socket import GLOBAL_BAR_SOCKET, BarBatchSubscriber, BarSocket
+
+
+@dataclass
+class BarColumns:
+    # one minute of bars for a set of symbols, one entry per row
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    @classmethod
+    def from_batch(cls, batch: np.ndarray) -> "BarColumns":
+        # views into the batch, nothing is copied
+        return cls(
+            batch["open"], batch["high"], batch["low"], batch["close"], batch["volume"]
+        )
+
+    @classmethod
+    def from_bars(cls, bars: List[Bar]) -> "BarColumns":
+        return cls(
+            np.array([bar.open for bar in bars], dtype=np.float64),
+            np.array([bar.high for bar in bars], dtype=np.float64),
+            np.array([bar.low for bar in bars], dtype=np.float64),
+            np.array([bar.close for bar in bars], dtype=np.float64),
+            np.array([bar.volume for bar in bars], dtype=np.float64),
+        )
+
+
+class VectorField(ABC):
+    # Same role as DataField, but holds the state of every symbol at once
+    # with one row per symbol.
+    def __init__(self, name: str, window_length: int):
+        self.name = name
+        self.window_length = window_length
+
+    @abstractmethod
+    def add_rows(self, rows: int) -> None:
+        pass
+
+    @abstractmethod
+    def update(self, rows: np.ndarray, bars: BarColumns) -> None:
+        pass
+
+    @abstractmethod
+    def get_data(self, rows: np.ndarray) -> np.ndarray:
+        # (len(rows), window_length)
+        pass
+
+
+class UniverseMarketData(BarBatchSubscriber):
+    def __init__(
+        self, window_length: int, bar_socket: BarSocket = GLOBAL_BAR_SOCKET
+    ) -> None:
+        self.window_length = window_length
+        self.fields: List[VectorField] = []
+        self.rows: Dict[str, int] = {}  # maps a symbol to its row
+
+        # bars are buffered until the minute changes so a whole minute of
+        # the universe goes through each field in one call
+        self.pending: List[Bar] = []
+        self.pending_symbols = set()
+
+        # every bar comes in here, batches of them in one call, bars of
+        # symbols that aren't registered are skipped
+        bar_socket.add_batch_subscriber(self)
+
+    def add_field(self, field: VectorField) -> None:
+        if self.window_length != field.window_length:
+            raise ValueError(
+                f"Window length of {self.window_length} does not match {field.window_length} for {field.name}"
+            )
+        if len(self.rows) > 0:
+            field.add_rows(len(self.rows))
+        self.fields.append(field)
+
+    def register_symbol(self, symbol: str) -> None:
+        if symbol in self.rows:
+            raise ValueError(f"Symbol {symbol} is already registered")
+
+        self.rows[symbol] = len(self.rows)
+        for field in self.fields:
+            field.add_rows(1)
+
+    def __check_symbol(self, symbol: str):
+        assert symbol in self.rows, f"Symbol {symbol} not registered"
+
+    def update_bar(self, bar: Bar):
+        if bar.symbol not in self.rows:
+            return
+
+        if len(self.pending) > 0 and (
+            bar.timestamp != self.pending[0].timestamp
+            or bar.symbol in self.pending_symbols
+        ):
+            self.flush()
+
+        self.pending.append(bar)
+        self.pending_symbols.add(bar.symbol)
+
+    def flush(self) -> None:
+        if len(self.pending) == 0:
+            return
+
+        bars = self.pending
+        self.pending = []
+        self.pending_symbols = set()
+
+        rows = np.array([self.rows[bar.symbol] for bar in bars], dtype=np.int64)
+        self.__update(rows, BarColumns.from_bars(bars))
+
+    def update_bars(self, batch: np.ndarray) -> None:
+        # BAR_DTYPE batch in time order, single bars received before it go
+        # first
+        self.flush()
+
+        rows = np.array(
+            [self.rows.get(symbol, -1) for symbol in batch["symbol"].tolist()],
+            dtype=np.int64,
+        )
+        known = rows >= 0
+        if not known.all():
+            batch = batch[known]
+            rows = rows[known]
+
+        self.__update(rows, BarColumns.from_batch(batch))
+
+    def __update(self, rows: np.ndarray, columns: BarColumns) -> None:
+        if len(rows) == 0:
+            return
+
+        # a symbol can only appear once per vectorized update, split
+        # wherever one repeats
+        if len(np.unique(rows)) == len(rows):
+            for field in self.fields:
+                field.update(rows, columns)
+            return
+
+        start = 0
+        seen = set()
+        for i, row in enumerate(rows.tolist()):
+            if row in seen:
+                self.__update_slice(rows, columns, start, i)
+                start = i
+                seen = set()
+            seen.add(row)
+        self.__update_slice(rows, columns, start, len(rows))
+
+    def __update_slice(
+        self, rows: np.ndarray, columns: BarColumns, start: int, end: int
+    ) -> None:
+        part = BarColumns(
+            columns.open[start:end],
+            columns.high[start:end],
+            columns.low[start:end],
+            columns.close[start:end],
+            columns.volume[start:end],
+        )
+        for field in self.fields:
+            field.update(rows[start:end], part)
+
+    def state(self, symbol: str) -> np.ndarray:
+        self.__check_symbol(symbol)
+        return self.__state(np.array([self.rows[symbol]]))[0]
+
+    def state_all(self) -> np.ndarray:
+        # (symbols, window_length, fields), rows in registration order
+        return self.__state(np.arange(len(self.rows)))
+
+    def __state(self, rows: np.ndarray) -> np.ndarray:
+        self.flush()
+        return np.stack([field.get_data(rows) for field in self.fields], axis=2)
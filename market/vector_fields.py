@@ -0,0 +1,233 @@
+import numpy as np
+
+from market.ring_buffer import RingMatrix
+from market.universe import BarColumns, VectorField
+
+# Vectorized counterparts of the fields in simple_fields.py. Each one keeps
+# the same definition as its per-symbol version so the two engines produce
+# the same state.
+
+
+class VectorLogReturnField(VectorField):
+    def __init__(self, name: str, window_length: int):
+        super().__init__(name, window_length)
+
+        self.log_ref = RingMatrix(0, window_length)
+        self.data = RingMatrix(0, window_length)
+
+    def add_rows(self, rows: int) -> None:
+        self.log_ref.add_rows(rows)
+        self.data.add_rows(rows)
+
+    def get_data(self, rows: np.ndarray) -> np.ndarray:
+        count = self.data.count[rows]
+        base = np.where(count > 0, self.log_ref.get(rows, 0), 1.0)[:, None]
+
+        # slots not filled yet take the base so their log return is zero
+        valid = np.arange(self.window_length) >= self.window_length - count[:, None]
+        data = np.where(valid, self.data.ordered(rows), base)
+        return np.log(data / base)
+
+    def add_entry(self, rows: np.ndarray, values: np.ndarray, ref: np.ndarray):
+        if np.any(values <= 0):
+            raise ValueError("Value must be positive for log return calculation")
+        self.data.append(rows, values)
+        self.log_ref.append(rows, ref)
+
+
+class VectorOpenPriceField(VectorLogReturnField):
+    def update(self, rows: np.ndarray, bars: BarColumns):
+        self.add_entry(rows, bars.open, bars.open)
+
+
+class VectorLowPriceField(VectorLogReturnField):
+    def update(self, rows: np.ndarray, bars: BarColumns):
+        self.add_entry(rows, bars.low, bars.open)
+
+
+class VectorHighPriceField(VectorLogReturnField):
+    def update(self, rows: np.ndarray, bars: BarColumns):
+        self.add_entry(rows, bars.high, bars.open)
+
+
+class VectorClosePriceField(VectorLogReturnField):
+    def update(self, rows: np.ndarray, bars: BarColumns):
+        self.add_entry(rows, bars.close, bars.open)
+
+
+class VectorVolumeField(VectorLogReturnField):
+    def update(self, rows: np.ndarray, bars: BarColumns):
+        self.add_entry(rows, bars.volume, bars.volume)
+
+
+class VectorMovingAverageField(VectorLogReturnField):
+    def __init__(self, name: str, window_length: int, period: int):
+        super().__init__(name, window_length)
+
+        self.period = period
+        self.closes = RingMatrix(0, period)
+
+    def add_rows(self, rows: int) -> None:
+        super().add_rows(rows)
+        self.closes.add_rows(rows)
+
+    def next_values(self, rows: np.ndarray, close: np.ndarray) -> np.ndarray:
+        # takes in the bars' closes and returns the new averages, slots not
+        # filled yet hold zeros
+        self.closes.append(rows, close)
+        return self.closes.buffer[rows].sum(axis=1) / self.closes.count[rows]
+
+    def update(self, rows: np.ndarray, bars: BarColumns):
+        new_ma = self.next_values(rows, bars.close)
+        self.add_entry(rows, new_ma, new_ma)
+
+
+class VectorExponentialMovingAverageField(VectorLogReturnField):
+    def __init__(self, name: str, window_length: int, period: int):
+        super().__init__(name, window_length)
+
+        self.period = period
+        self.multiplier = 2 / (period + 1)
+
+    def update(self, rows: np.ndarray, bars: BarColumns):
+        close = bars.close
+        new_ma = np.where(
+            self.data.count[rows] == 0,
+            close,
+            self.data.get(rows, -1) * (1 - self.multiplier) + close * self.multiplier,
+        )
+        self.add_entry(rows, new_ma, new_ma)
+
+
+class VectorRSIField(VectorField):
+    def __init__(self, name: str, window_length: int, periods: int = 14):
+        super().__init__(name, window_length)
+
+        self.gains = RingMatrix(0, periods)
+        self.losses = RingMatrix(0, periods)
+        self.prev_price = np.zeros(0)
+        self.data = RingMatrix(0, window_length)
+
+    def add_rows(self, rows: int) -> None:
+        self.gains.add_rows(rows)
+        self.losses.add_rows(rows)
+        self.prev_price = np.concatenate([self.prev_price, np.zeros(rows)])
+        self.data.add_rows(rows)
+
+    def get_data(self, rows: np.ndarray) -> np.ndarray:
+        return self.data.ordered(rows)
+
+    def update(self, rows: np.ndarray, bars: BarColumns):
+        close = bars.close
+        first = self.data.count[rows] == 0
+
+        diff = np.where(first, 0.0, close - self.prev_price[rows])
+        self.gains.append(rows, np.maximum(diff, 0))
+        self.losses.append(rows, np.maximum(-diff, 0))
+        self.prev_price[rows] = close
+
+        # unfilled slots are zero, so a plain row sum is the window sum
+        count = self.gains.count[rows]
+        avg_gain = self.gains.buffer[rows].sum(axis=1) / count
+        avg_loss = self.losses.buffer[rows].sum(axis=1) / count
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+        rsi = np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), rsi)
+        rsi = np.where(first, 50.0, rsi)
+
+        self.data.append(rows, rsi)
+
+
+class VectorMACDField(VectorField):
+    def __init__(self, name: str, window_length: int):
+        super().__init__(name, window_length)
+
+        self.short_ema = VectorExponentialMovingAverageField("short_ema", 1, 12)
+        self.long_ema = VectorExponentialMovingAverageField("long_ema", 1, 26)
+
+        self.data = RingMatrix(0, window_length)  # MACD value, divided by stock price
+
+    def add_rows(self, rows: int) -> None:
+        self.short_ema.add_rows(rows)
+        self.long_ema.add_rows(rows)
+        self.data.add_rows(rows)
+
+    def get_data(self, rows: np.ndarray) -> np.ndarray:
+        return self.data.ordered(rows)
+
+    def update(self, rows: np.ndarray, bars: BarColumns):
+        self.short_ema.update(rows, bars)
+        self.long_ema.update(rows, bars)
+
+        macd = self.short_ema.data.get(rows, -1) - self.long_ema.data.get(rows, -1)
+        self.data.append(rows, 100 * macd / bars.close)
+
+
+class VectorVWAPField(VectorLogReturnField):
+    def __init__(self, name: str, window_length: int, period: int = 60):
+        super().__init__(name, window_length)
+
+        self.period = period
+        self.volumes = RingMatrix(0, period)
+        self.price_volumes = RingMatrix(0, period)
+
+    def add_rows(self, rows: int) -> None:
+        super().add_rows(rows)
+        self.volumes.add_rows(rows)
+        self.price_volumes.add_rows(rows)
+
+    def update(self, rows: np.ndarray, bars: BarColumns):
+        self.volumes.append(rows, bars.volume)
+        self.price_volumes.append(rows, bars.volume * bars.close)
+
+        price_volume = self.price_volumes.buffer[rows].sum(axis=1)
+        volume = self.volumes.buffer[rows].sum(axis=1)
+        current_vwap = price_volume / volume
+        self.add_entry(rows, current_vwap, current_vwap)
+
+
+class VectorBBField(VectorLogReturnField):
+    # sign is 1 for the high band and -1 for the low band
+    def __init__(self, name: str, window_length: int, sign: int, period: int = 20):
+        super().__init__(name, window_length)
+
+        self.sign = sign
+        self.sma = VectorMovingAverageField("", period, period)
+        # the std is over the last `period` values of the average
+        self.sma_history = RingMatrix(0, period)
+
+    def add_rows(self, rows: int) -> None:
+        super().add_rows(rows)
+        self.sma.add_rows(rows)
+        self.sma_history.add_rows(rows)
+
+    def update(self, rows: np.ndarray, bars: BarColumns):
+        close = bars.close
+
+        new_ma = self.sma.next_values(rows, close)
+        self.sma_history.append(rows, new_ma)
+
+        sma = self.sma_history.buffer[rows]
+        filled = self.sma_history.filled(rows)
+        count = self.sma_history.count[rows]
+        mean = np.where(filled, sma, 0).sum(axis=1) / count
+        deviations = np.where(filled, sma - mean[:, None], 0)
+        std_dev = np.sqrt((deviations**2).sum(axis=1) / count)
+
+        band = np.where(
+            self.data.count[rows] < self.window_length,
+            close,
+            new_ma + self.sign * 2 * std_dev,
+        )
+        self.add_entry(rows, band, band)
+
+
+class VectorHighBBField(VectorBBField):
+    def __init__(self, name: str, window_length: int, period: int = 20):
+        super().__init__(name, window_length, 1, period)
+
+
+class VectorLowBBField(VectorBBField):
+    def __init__(self, name: str, window_length: int, period: int = 20):
+        super().__init__(name, window_length, -1, period)
@@ -0,0 +1,368 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from data.bar_store import BarStore, StoredBars
+from market.indicator_graph import (
+    BollingerNode,
+    EMANode,
+    MACDNode,
+    RSINode,
+    SMANode,
+    VWAPNode,
+)
+from market.market_data import MarketData
+from market.simple_fields import (
+    ClosePriceField,
+    ExponentialMovingAverageField,
+    HighBBField,
+    HighPriceField,
+    LowBBField,
+    LowPriceField,
+    MACDFIeld,
+    MovingAverageField,
+    OpenPriceField,
+    RSIField,
+    VolumeField,
+    VWAPField,
+)
+from market.snapshot import node_id, pack_columns
+
+# Seeds a MarketData system from history in one pass instead of replaying it
+# bar by bar. Every indicator is computed for all symbols at once as
+# (symbols, bars) arrays, symbols with the same number of bars together, and
+# the result is written into the fields with MarketData.restore in the
+# layout MarketData.snapshot produces.
+
+
+def load_store_history(
+    store: BarStore, symbols: List[str], end: date, bars: int = 390
+) -> Dict[str, StoredBars]:
+    # the last `bars` minute bars of each symbol up to end, symbols missing
+    # from the store are left out
+    stored = set(store.symbols())
+    return {
+        symbol: store.tail(symbol, end, bars) for symbol in symbols if symbol in stored
+    }
+
+
+def load_client_history(
+    client,
+    symbols: List[str],
+    bars: int = 390,
+    end: Optional[datetime] = None,
+    lookback: timedelta = timedelta(days=5),
+) -> Dict[str, StoredBars]:
+    # the last `bars` minute bars of each symbol from one request to an
+    # alpaca StockHistoricalDataClient, or anything with the same
+    # get_stock_bars
+    from alpaca.data.requests import StockBarsRequest
+    from alpaca.data.timeframe import TimeFrame
+
+    if end is None:
+        end = datetime.now(timezone.utc)
+
+    request = StockBarsRequest(
+        symbol_or_symbols=symbols,
+        timeframe=TimeFrame.Minute,
+        start=end - lookback,
+        end=end,
+    )
+
+    history = {}
+    for symbol, symbol_bars in client.get_stock_bars(request).data.items():
+        symbol_bars = symbol_bars[-bars:]
+        history[symbol] = StoredBars(
+            symbol,
+            np.array(
+                [int(bar.timestamp.timestamp()) for bar in symbol_bars], dtype=np.int64
+            ),
+            np.array(
+                [
+                    [bar.open for bar in symbol_bars],
+                    [bar.high for bar in symbol_bars],
+                    [bar.low for bar in symbol_bars],
+                    [bar.close for bar in symbol_bars],
+                    [bar.volume for bar in symbol_bars],
+                ],
+                dtype=np.float64,
+            ),
+        )
+    return history
+
+
+class WarmupBars:
+    # The bars of a group of symbols with the same number of bars, one row per
+    # symbol, and the indicator series computed from them so far
+    def __init__(self, history: List[StoredBars]) -> None:
+        columns = np.stack([np.asarray(bars.columns) for bars in history], axis=1)
+        self.open, self.high, self.low, self.close, self.volume = columns
+        self.symbols = len(history)
+        self.bars = columns.shape[2]
+
+        # node key -> (symbols, bars) series of the node's value
+        self.series: Dict[tuple, np.ndarray] = {}
+        # node key -> the node's state after the last bar
+        self.states: Dict[tuple, dict] = {}
+
+    def node(self, key: tuple) -> np.ndarray:
+        if key not in self.series:
+            node_class = key[0]
+            if node_class not in NODE_STATES:
+                raise ValueError(f"No vectorized warm-up for {node_class.__name__}")
+            self.series[key], self.states[key] = NODE_STATES[node_class](self, *key[1:])
+        return self.series[key]
+
+    def state(self, key: tuple) -> dict:
+        self.node(key)
+        return self.states[key]
+
+
+def window_sums(values: np.ndarray, window: int) -> np.ndarray:
+    # sum of the last min(t + 1, window) values at every t
+    padded = np.concatenate([np.zeros((len(values), window - 1)), values], axis=1)
+    return sliding_window_view(padded, window, axis=1).sum(axis=2)
+
+
+def ring_state(values: np.ndarray, capacity: int, prefix: str = "") -> dict:
+    # RingBuffer holding the last `capacity` of each row's values, laid out
+    # as if it had been filled from empty
+    symbols, bars = values.shape
+    count = min(bars, capacity)
+    buffer = np.zeros((symbols, 2 * capacity))
+    buffer[:, :count] = values[:, bars - count :]
+    buffer[:, capacity : capacity + count] = values[:, bars - count :]
+    return {
+        prefix + "buffer": buffer,
+        prefix + "head": np.full(symbols, count % capacity),
+        prefix + "count": np.full(symbols, count),
+    }
+
+
+def rolling_sum_state(values: np.ndarray, capacity: int, prefix: str = "") -> dict:
+    # RollingSum right after a resync
+    window = values[:, -capacity:]
+    return {
+        **ring_state(values, capacity, prefix + "values."),
+        prefix + "total": window.sum(axis=1),
+        prefix + "nonzero": np.count_nonzero(window, axis=1),
+        prefix + "appends_since_resync": np.zeros(len(values), dtype=np.int64),
+    }
+
+
+def rolling_variance_state(values: np.ndarray, capacity: int, prefix: str = "") -> dict:
+    # RollingVariance right after a resync
+    window = values[:, -capacity:]
+    mean = window.mean(axis=1)
+    return {
+        **ring_state(values, capacity, prefix + "values."),
+        prefix + "mean": mean,
+        prefix + "m2": ((window - mean[:, None]) ** 2).sum(axis=1),
+        prefix + "appends_since_resync": np.zeros(len(values), dtype=np.int64),
+    }
+
+
+# Node states. Each takes the node's key parameters and returns the node's
+# value series and its state after the last bar, keyed by attribute path.
+# The recursive ones step through time with every symbol in one array, in
+# the same order of operations as the node's update.
+
+
+def sma_state(bars: WarmupBars, period: int):
+    count = np.minimum(np.arange(1, bars.bars + 1), period)
+    sma = window_sums(bars.close, period) / count
+    return sma, {
+        "value": sma[:, -1],
+        **rolling_sum_state(bars.close, period, "closes."),
+    }
+
+
+def ema_state(bars: WarmupBars, period: int):
+    close = bars.close
+    multiplier = 2 / (period + 1)
+    ema = np.empty_like(close)
+    ema[:, 0] = close[:, 0]
+    for t in range(1, bars.bars):
+        ema[:, t] = ema[:, t - 1] * (1 - multiplier) + close[:, t] * multiplier
+
+    return ema, {"value": ema[:, -1], "count": np.full(bars.symbols, bars.bars)}
+
+
+def macd_state(bars: WarmupBars, short: int = 12, long: int = 26):
+    macd = bars.node((EMANode, short)) - bars.node((EMANode, long))
+    return macd, {"value": macd[:, -1]}
+
+
+def rsi_state(bars: WarmupBars, periods: int):
+    diff = np.diff(bars.close, axis=1, prepend=bars.close[:, :1])
+    gains = np.maximum(diff, 0)
+    losses = np.maximum(-diff, 0)
+
+    count = np.minimum(np.arange(1, bars.bars + 1), periods)
+    avg_gain = window_sums(gains, periods) / count
+    avg_loss = window_sums(losses, periods) / count
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+    rsi = np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), rsi)
+    rsi[:, 0] = 50
+
+    return rsi, {
+        "value": rsi[:, -1],
+        "prev_price": bars.close[:, -1],
+        "count": np.full(bars.symbols, bars.bars),
+        **rolling_sum_state(gains, periods, "gains."),
+        **rolling_sum_state(losses, periods, "losses."),
+    }
+
+
+def vwap_state(bars: WarmupBars, period: int):
+    price_volume = bars.volume * bars.close
+    vwap = window_sums(price_volume, period) / window_sums(bars.volume, period)
+
+    return vwap, {
+        "value": vwap[:, -1],
+        **rolling_sum_state(bars.volume, period, "volumes."),
+        **rolling_sum_state(price_volume, period, "price_volumes."),
+    }
+
+
+def bollinger_std(bars: WarmupBars, period: int) -> np.ndarray:
+    # population std of the last min(t + 1, period) SMA values at every t
+    sma = bars.node((SMANode, period))
+    padded = np.concatenate([np.full((bars.symbols, period - 1), np.nan), sma], axis=1)
+    windows = sliding_window_view(padded, period, axis=1)
+    count = np.minimum(np.arange(1, bars.bars + 1), period)
+    mean = np.nansum(windows, axis=2) / count
+    m2 = np.nansum((windows - mean[:, :, None]) ** 2, axis=2)
+    return np.sqrt(np.maximum(m2, 0) / count)
+
+
+def bollinger_state(bars: WarmupBars, period: int):
+    sma = bars.node((SMANode, period))
+    variance = rolling_variance_state(sma, period, "sma_variance.")
+    count = min(bars.bars, period)
+    std = np.sqrt(np.maximum(variance["sma_variance.m2"], 0) / count)
+
+    return sma, {"value": sma[:, -1], "std": std, **variance}
+
+
+NODE_STATES: Dict[type, Callable] = {
+    SMANode: sma_state,
+    EMANode: ema_state,
+    MACDNode: macd_state,
+    RSINode: rsi_state,
+    VWAPNode: vwap_state,
+    BollingerNode: bollinger_state,
+}
+
+
+# Field states. Each takes the bars and the field of one symbol of the group
+# (for its parameters and nodes) and returns the field's state after the
+# last bar.
+
+
+def node_key(field, node) -> tuple:
+    for key, graph_node in field.graph.nodes.items():
+        if graph_node is node:
+            return key
+    raise ValueError(f"{type(node).__name__} of {field.name} is not in its graph")
+
+
+def log_return_state(field, values: np.ndarray, refs: np.ndarray) -> dict:
+    if np.any(values <= 0):
+        raise ValueError("Value must be positive for log return calculation")
+    return {
+        **ring_state(values, field.window_length, "data."),
+        **ring_state(refs, field.window_length, "log_ref."),
+    }
+
+
+def band_state(bars: WarmupBars, field, sign: int) -> dict:
+    # the close until the field's window is full, the band after that
+    key = node_key(field, field.bands)
+    band = bars.node(key) + sign * 2 * bollinger_std(bars, key[1])
+    band[:, : field.window_length] = bars.close[:, : field.window_length]
+    return log_return_state(field, band, band)
+
+
+def macd_field_state(bars: WarmupBars, field) -> dict:
+    macd = bars.node(node_key(field, field.macd))
+    return ring_state(100 * macd / bars.close, field.window_length, "data.")
+
+
+def node_field_state(bars: WarmupBars, field, node) -> dict:
+    values = bars.node(node_key(field, node))
+    return log_return_state(field, values, values)
+
+
+FIELD_STATES: Dict[type, Callable] = {
+    OpenPriceField: lambda bars, field: log_return_state(field, bars.open, bars.open),
+    LowPriceField: lambda bars, field: log_return_state(field, bars.low, bars.open),
+    HighPriceField: lambda bars, field: log_return_state(field, bars.high, bars.open),
+    ClosePriceField: lambda bars, field: log_return_state(field, bars.close, bars.open),
+    VolumeField: lambda bars, field: log_return_state(field, bars.volume, bars.volume),
+    MovingAverageField: lambda bars, field: node_field_state(bars, field, field.sma),
+    ExponentialMovingAverageField: lambda bars, field: node_field_state(
+        bars, field, field.ema
+    ),
+    VWAPField: lambda bars, field: node_field_state(bars, field, field.vwap),
+    RSIField: lambda bars, field: ring_state(
+        bars.node(node_key(field, field.rsi)), field.window_length, "data."
+    ),
+    MACDFIeld: macd_field_state,
+    HighBBField: lambda bars, field: band_state(bars, field, 1),
+    LowBBField: lambda bars, field: band_state(bars, field, -1),
+}
+
+
+def warmup_arrays(
+    market_data: MarketData, symbols: List[str], history: List[StoredBars]
+) -> Dict[str, np.ndarray]:
+    # snapshot arrays for symbols with the same number of bars. Any state a
+    # warm-up doesn't compute keeps the first symbol's current value.
+    bars = WarmupBars(history)
+
+    values = {}
+    for field in market_data.fields:
+        data_field = field.data_fields[symbols[0]]
+        if type(data_field) not in FIELD_STATES:
+            raise ValueError(f"No vectorized warm-up for {type(data_field).__name__}")
+        values[f"fields/{field.name}"] = FIELD_STATES[type(data_field)](
+            bars, data_field
+        )
+
+    for i, graph in enumerate(market_data.graphs(symbols[0])):
+        for key in graph.nodes:
+            values[f"graphs/{i}/{node_id(key)}"] = bars.state(key)
+
+    blocks = []
+    for path, obj in zip(
+        market_data.state_paths(symbols[0]), market_data.state_objects(symbols[0])
+    ):
+        blocks += pack_columns(obj, values[path], len(symbols))
+
+    arrays = market_data.state_layout()
+    arrays["state"] = np.concatenate(blocks, axis=1)
+    arrays["symbols"] = np.array(symbols, dtype=str)
+    arrays["last_bar_ns"] = (
+        np.array([bars.timestamps[-1] for bars in history], dtype=np.int64)
+        * 1_000_000_000
+    )
+    return arrays
+
+
+def warm_up(market_data: MarketData, history: Dict[str, StoredBars]) -> List[str]:
+    # Seeds every registered symbol that has history, before its bars go
+    # live. Returns the symbols that were seeded.
+    groups: Dict[int, List[str]] = {}
+    for symbol, bars in history.items():
+        if symbol in market_data.rows and len(bars) > 0:
+            groups.setdefault(len(bars), []).append(symbol)
+
+    warmed = []
+    for symbols in groups.values():
+        arrays = warmup_arrays(market_data, symbols, [history[s] for s in symbols])
+        warmed += market_data.restore(arrays, max_gap=float("inf"))
+    return warmed
@@ -0,0 +1,67 @@
+import threading
+from typing import Dict
+
+
+class Portfolio:
+    # NAV and exposure of an account, kept current by its positions pushing
+    # their new value whenever a bar or fill changes it. Every read is O(1),
+    # only the change of the position that moved is applied. Positions push
+    # from the bar and trade threads (and simulated fills from the caller's),
+    # so updates and reads spanning more than one attribute take the lock.
+    def __init__(self, resync_every: int = 10000) -> None:
+        self.values: Dict[str, float] = {}  # market value per symbol
+        self.cash = 0.0
+        self.net = 0.0  # long minus short
+        self.gross = 0.0  # long plus short
+
+        # the running sums are recomputed from values every resync_every
+        # updates so rounding error can't build up
+        self.resync_every = resync_every
+        self.updates_since_resync = 0
+
+        self.lock = threading.Lock()
+
+    def set_value(self, symbol: str, value: float) -> None:
+        with self.lock:
+            old = self.values.get(symbol, 0.0)
+            self.values[symbol] = value
+            self.net += value - old
+            self.gross += abs(value) - abs(old)
+
+            self.updates_since_resync += 1
+            if self.updates_since_resync >= self.resync_every:
+                self.__resync()
+
+    def set_cash(self, cash: float) -> None:
+        with self.lock:
+            self.cash = cash
+
+    def resync(self) -> None:
+        with self.lock:
+            self.__resync()
+
+    def __resync(self) -> None:
+        self.net = sum(self.values.values())
+        self.gross = sum(abs(value) for value in self.values.values())
+        self.updates_since_resync = 0
+
+    @property
+    def nav(self) -> float:
+        with self.lock:
+            return self.cash + self.net
+
+    def weight(self, symbol: str) -> float:
+        nav = self.nav
+        return self.values.get(symbol, 0.0) / nav if nav else 0.0
+
+    def weights(self) -> Dict[str, float]:
+        with self.lock:
+            nav = self.cash + self.net
+            values = list(self.values.items())
+        return {symbol: value / nav if nav else 0.0 for symbol, value in values}
+
+    def gross_leverage(self) -> float:
+        with self.lock:
+            nav = self.cash + self.net
+            gross = self.gross
+        return gross / nav if nav else 0.0
@@ -1,21 +1,47 @@
-from dataclasses import dataclass
-from datetime import datetime
+from typing import Optional
 
-from alpaca.trading.enums import OrderSide
-
-from shared import Bar, Trade
+from journal import DEBUG, GLOBAL_JOURNAL, INFO
+from ledger import TradeLedger
+from portfolio import Portfolio
+from shared import Bar, OrderSide, Trade
 from sockets.bar_socket import BarSubscriber
 from sockets.trade_socket import TradeSubscriber
 
 
-# TODO: do average price per share tracking based on trades that come in
 class Position(TradeSubscriber, BarSubscriber):
-    def __init__(self, ticker: str, qty: float, price: float) -> None:
+    def __init__(
+        self,
+        ticker: str,
+        qty: float,
+        price: float,
+        avg_cost: Optional[float] = None,
+        ledger_capacity: int = 1024,
+        spill_dir: Optional[str] = None,
+    ) -> None:
         self.symbol = ticker
         self.qty = qty
         self.price = price
 
-        self.trades: list[Trade] = []
+        # fills and cost basis, the opening quantity is held at avg_cost
+        # (the current price when it isn't known)
+        self.ledger = TradeLedger(
+            ticker,
+            qty,
+            price if avg_cost is None else avg_cost,
+            ledger_capacity,
+            spill_dir,
+        )
+
+        # aggregate that this position's value changes are pushed into
+        self.portfolio: Optional[Portfolio] = None
+
+    def attach(self, portfolio: Portfolio) -> None:
+        self.portfolio = portfolio
+        self.publish_value()
+
+    def publish_value(self) -> None:
+        if self.portfolio is not None:
+            self.portfolio.set_value(self.symbol, self.qty * self.price)
 
     def __repr__(self) -> str:
         return f"{self.symbol} {self.qty} {self.price}"
@@ -24,35 +50,66 @@ class Position(TradeSubscriber, BarSubscriber):
         if trade.symbol != self.symbol:
             return
 
-        print("Updating position " + repr(trade))
-        self.trades.append(trade)
         if trade.side == OrderSide.BUY:
-            self.qty += trade.qty
+            self.ledger.record(1, trade.qty, trade.price, trade.timestamp)
         elif trade.side == OrderSide.SELL:
-            self.qty -= trade.qty
+            self.ledger.record(-1, trade.qty, trade.price, trade.timestamp)
+        self.qty = self.ledger.qty
 
         self.price = trade.price
+        self.publish_value()
+
+        GLOBAL_JOURNAL.record(
+            INFO,
+            "position",
+            symbol=self.symbol,
+            side=trade.side,
+            trade_qty=trade.qty,
+            trade_price=trade.price,
+            qty=self.qty,
+            avg_cost=self.ledger.avg_cost,
+            realized=self.ledger.realized,
+        )
 
     def update_bar(self, bar: Bar):
         if bar.symbol != self.symbol:
             return
 
-        print("Updating position " + repr(bar))
         self.price = bar.close
+        self.publish_value()
+
+        if GLOBAL_JOURNAL.enabled(DEBUG):
+            GLOBAL_JOURNAL.record(
+                DEBUG, "position_price", symbol=self.symbol, price=self.price
+            )
 
     def value(self):
         return self.qty * self.price
 
+    def avg_cost(self) -> float:
+        return self.ledger.avg_cost
+
+    def realized_pnl(self) -> float:
+        return self.ledger.realized
+
+    def unrealized_pnl(self) -> float:
+        return self.ledger.unrealized(self.price)
+
 
 class CashPosition(Position):
     def __init__(self, ticker: str, qty: float, price: float) -> None:
-        super().__init__(ticker, qty, price)
+        super().__init__(ticker, qty, price, ledger_capacity=1)
         self.symbol = "$"
         self.qty = qty
         self.price = 1
 
+    def publish_value(self) -> None:
+        if self.portfolio is not None:
+            self.portfolio.set_cash(self.qty)
+
     def update_trade(self, trade: Trade):
         if trade.side == OrderSide.BUY:
             self.qty -= trade.qty * trade.price
         elif trade.side == OrderSide.SELL:
             self.qty += trade.qty * trade.price
+        self.publish_value()
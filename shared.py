@@ -1,10 +1,29 @@
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from functools import cache
+from typing import Iterable, List, Optional
 
-from alpaca.trading.enums import OrderSide
+import numpy as np
 
 
-@dataclass
+class OrderSide(str, Enum):
+    # Same values as alpaca's OrderSide, so the two (and the raw "buy" /
+    # "sell" strings from the streams) compare equal, without importing the
+    # alpaca trading package for it
+    BUY = "buy"
+    SELL = "sell"
+
+
+@cache
+def load_env() -> None:
+    # reads .env into the environment, once per process
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+
+@dataclass(slots=True)
 class Bar:
     symbol: str
     open: float
@@ -18,15 +37,92 @@ class Bar:
         return f"{self.symbol}\t{self.open}\t{self.high}\t{self.low}\t{self.close}\t{self.volume}\t{self.timestamp}"
 
 
-@dataclass
+@dataclass(slots=True)
 class Trade:
     side: OrderSide
     symbol: str
     qty: float
     price: float
     timestamp: datetime
+    # the broker's order id and the id the order was submitted with
+    order_id: Optional[str] = None
+    client_order_id: Optional[str] = None
+    # "fill" for the last fill of an order, "partial_fill" before it
+    event: str = "fill"
 
     def __repr__(self) -> str:
         return (
             f"{self.side}\t{self.symbol}\t{self.qty}\t${self.price}\t{self.timestamp}"
         )
+
+
+# A batch of bars as one structured array, one element per bar. Timestamps
+# are int64 nanoseconds since the epoch (UTC).
+SYMBOL_CHARS = 16
+BAR_DTYPE = np.dtype(
+    [
+        ("symbol", f"U{SYMBOL_CHARS}"),
+        ("open", np.float64),
+        ("high", np.float64),
+        ("low", np.float64),
+        ("close", np.float64),
+        ("volume", np.float64),
+        ("timestamp", np.int64),
+    ]
+)
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def timestamp_ns(timestamp) -> int:
+    # datetime, msgpack Timestamp (raw stream messages) or nanoseconds
+    if isinstance(timestamp, datetime):
+        return int(timestamp.timestamp() * 1_000_000) * 1000
+    if hasattr(timestamp, "to_unix_nano"):
+        return timestamp.to_unix_nano()
+    return int(timestamp)
+
+
+def check_symbols(symbols: Iterable[str]) -> None:
+    # numpy would silently cut longer symbols short in a batch
+    for symbol in symbols:
+        if len(symbol) > SYMBOL_CHARS:
+            raise ValueError(
+                f"Symbol {symbol} is longer than {SYMBOL_CHARS} characters"
+            )
+
+
+def bars_to_batch(bars: List[Bar]) -> np.ndarray:
+    check_symbols(bar.symbol for bar in bars)
+    return np.array(
+        [
+            (
+                bar.symbol,
+                bar.open,
+                bar.high,
+                bar.low,
+                bar.close,
+                bar.volume,
+                timestamp_ns(bar.timestamp),
+            )
+            for bar in bars
+        ],
+        dtype=BAR_DTYPE,
+    )
+
+
+def batch_to_bars(batch: np.ndarray) -> List[Bar]:
+    # timestamps come back as UTC datetimes
+    return [
+        Bar(
+            symbol,
+            opn,
+            high,
+            low,
+            close,
+            volume,
+            EPOCH + timedelta(microseconds=ns // 1000),
+        )
+        for symbol, opn, high, low, close, volume, ns in batch.tolist()
+    ]
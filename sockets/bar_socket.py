@@ -1,11 +1,23 @@
+import asyncio
 import os
 import threading
+import time
 from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
 
-from alpaca.data.live import StockDataStream
-from dotenv import load_dotenv
+import numpy as np
+from msgpack import Timestamp
 
-from shared import Bar
+from journal import GLOBAL_JOURNAL, INFO
+from shared import (
+    BAR_DTYPE,
+    Bar,
+    batch_to_bars,
+    check_symbols,
+    load_env,
+    timestamp_ns,
+)
+from sockets.instrumentation import Instrumentation
 
 
 class BarSubscriber(ABC):
@@ -14,21 +26,141 @@ class BarSubscriber(ABC):
         pass
 
 
-class BarSocket:
-    def __init__(self) -> None:
-        load_dotenv()
+class BarBatchSubscriber(BarSubscriber):
+    # Gets every bar, single bars through update_bar and batches (BAR_DTYPE
+    # arrays) through update_bars in one call
+    @abstractmethod
+    def update_bars(self, batch: np.ndarray):
+        pass
 
-        self.stream = StockDataStream(
-            os.environ.get("ALPACA_KEY", ""), os.environ.get("ALPACA_SECRET", "")
-        )
+
+def decode_raw_batch(messages: List[dict]) -> np.ndarray:
+    # raw stream bar messages straight into a BAR_DTYPE array
+    check_symbols(m["S"] for m in messages)
+    return np.array(
+        [
+            (m["S"], m["o"], m["h"], m["l"], m["c"], m["v"], timestamp_ns(m["t"]))
+            for m in messages
+        ],
+        dtype=BAR_DTYPE,
+    )
+
+
+class BarSocket:
+    def __init__(self, raw_flush_delay: float = 0.05) -> None:
+        # built on first use, see stream
+        self._stream = None
 
         self.stop_flag = threading.Event()
-        self.subscribers: list[BarSubscriber] = []
+        # subscribers keyed by the symbol they care about, plus a wildcard
+        # bucket for subscribers that want every bar
+        self.subscribers: Dict[str, list[BarSubscriber]] = {}
+        self.wildcard_subscribers: list[BarSubscriber] = []
+        self.batch_subscribers: list[BarBatchSubscriber] = []
+
+        # optional per-subscriber latency recording, see enable_instrumentation
+        self.instrumentation: Optional[Instrumentation] = None
 
         self.active_subs = set()
 
-    def add_subscriber(self, subscriber):
-        self.subscribers.append(subscriber)
+        # set by IngestQueue.start, stream bars are queued instead of being
+        # published on the stream thread
+        self.queue = None
+
+        # raw stream messages of the current minute, decoded and published as
+        # one batch once the minute changes or raw_flush_delay seconds after
+        # its first message, see update_raw
+        self.raw_flush_delay = raw_flush_delay
+        self.raw_messages: List[dict] = []
+        self.raw_timestamp = None
+        self.raw_flush_handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def stream(self):
+        # the alpaca stream (and its imports) only when a symbol is actually
+        # subscribed, so offline use never pays for them
+        if self._stream is None:
+            from alpaca.data.live import StockDataStream
+
+            load_env()
+            # raw messages skip the SDK's model parsing, see update_raw
+            self._stream = StockDataStream(
+                os.environ.get("ALPACA_KEY", ""),
+                os.environ.get("ALPACA_SECRET", ""),
+                raw_data=True,
+            )
+        return self._stream
+
+    def add_subscriber(self, subscriber, symbol: Optional[str] = None):
+        if symbol is None:
+            self.wildcard_subscribers.append(subscriber)
+        else:
+            self.subscribers.setdefault(symbol, []).append(subscriber)
+
+    def remove_subscriber(self, subscriber, symbol: Optional[str] = None):
+        if symbol is None:
+            self.wildcard_subscribers.remove(subscriber)
+            return
+
+        subs = self.subscribers.get(symbol, [])
+        subs.remove(subscriber)
+        if len(subs) == 0:
+            del self.subscribers[symbol]
+
+    def add_batch_subscriber(self, subscriber: BarBatchSubscriber):
+        self.batch_subscribers.append(subscriber)
+
+    def remove_batch_subscriber(self, subscriber: BarBatchSubscriber):
+        self.batch_subscribers.remove(subscriber)
+
+    async def update_raw(self, msg):
+        # raw stream message, keys as sent by Alpaca: S symbol, o h l c v,
+        # t msgpack timestamp. Every bar of a minute carries the same stamp
+        # and they arrive together, so they are buffered and go out through
+        # publish_batch without building a Bar per message.
+        timestamp = msg["t"]
+        if timestamp != self.raw_timestamp:
+            self.flush_raw()
+            self.raw_timestamp = timestamp
+
+        self.raw_messages.append(msg)
+        if self.raw_flush_handle is None:
+            self.raw_flush_handle = asyncio.get_running_loop().call_later(
+                self.raw_flush_delay, self.flush_raw
+            )
+
+    def flush_raw(self):
+        if self.raw_flush_handle is not None:
+            self.raw_flush_handle.cancel()
+            self.raw_flush_handle = None
+        if not self.raw_messages:
+            return
+
+        messages = self.raw_messages
+        self.raw_messages = []
+        batch = decode_raw_batch(messages)
+
+        if GLOBAL_JOURNAL.enabled(INFO):
+            timestamp = self.raw_timestamp
+            if timestamp.__class__ is Timestamp:
+                timestamp = timestamp.to_datetime()
+            for symbol, opn, high, low, close, volume, _ in batch.tolist():
+                GLOBAL_JOURNAL.record(
+                    INFO,
+                    "bar",
+                    symbol=symbol,
+                    open=opn,
+                    high=high,
+                    low=low,
+                    close=close,
+                    volume=volume,
+                    timestamp=timestamp,
+                )
+
+        if self.queue is not None:
+            self.queue.put_batch(batch)
+        else:
+            self.publish_batch(batch)
 
     async def update_all(self, data):
         # convert data into a bar
@@ -43,13 +175,85 @@ class BarSocket:
 
         bar = Bar(symbol, opn, high, low, close, volume, timestamp)
 
-        for sub in self.subscribers:
+        self.__record(bar)
+        if self.queue is not None:
+            self.queue.put_bar(bar)
+        else:
+            self.publish(bar)
+
+    def __record(self, bar: Bar):
+        GLOBAL_JOURNAL.record(
+            INFO,
+            "bar",
+            symbol=bar.symbol,
+            open=bar.open,
+            high=bar.high,
+            low=bar.low,
+            close=bar.close,
+            volume=bar.volume,
+            timestamp=bar.timestamp,
+        )
+
+    def enable_instrumentation(
+        self, instrumentation: Optional[Instrumentation] = None
+    ) -> Instrumentation:
+        if instrumentation is None:
+            instrumentation = Instrumentation()
+        self.instrumentation = instrumentation
+        return instrumentation
+
+    def disable_instrumentation(self):
+        self.instrumentation = None
+
+    def publish(self, bar: Bar):
+        # fan a bar out to its subscribers, used directly by replays
+        if self.instrumentation is not None:
+            self.__publish_timed(bar, self.batch_subscribers)
+            return
+
+        self.__publish_bar(bar)
+        for sub in self.batch_subscribers:
+            sub.update_bar(bar)
+
+    def __publish_bar(self, bar: Bar):
+        for sub in self.subscribers.get(bar.symbol, ()):
+            sub.update_bar(bar)
+        for sub in self.wildcard_subscribers:
             sub.update_bar(bar)
 
+    def publish_batch(self, batch: np.ndarray):
+        # batch subscribers get the array as is, Bar objects are only built
+        # for the bars that per-bar subscribers want
+        for sub in self.batch_subscribers:
+            sub.update_bars(batch)
+
+        if not self.subscribers and not self.wildcard_subscribers:
+            return
+        if not self.wildcard_subscribers:
+            batch = batch[np.isin(batch["symbol"], list(self.subscribers))]
+
+        for bar in batch_to_bars(batch):
+            if self.instrumentation is not None:
+                self.__publish_timed(bar, ())
+            else:
+                self.__publish_bar(bar)
+
+    def __publish_timed(self, bar: Bar, batch_subscribers):
+        for_subscriber = self.instrumentation.for_subscriber
+        for subs in (
+            self.subscribers.get(bar.symbol, ()),
+            self.wildcard_subscribers,
+            batch_subscribers,
+        ):
+            for sub in subs:
+                start = time.perf_counter_ns()
+                sub.update_bar(bar)
+                for_subscriber(sub).record(time.perf_counter_ns() - start)
+
     def subscribe_to_symbol(self, symbol):
         if symbol in self.active_subs:
             return
-        self.stream.subscribe_bars(self.update_all, symbol)
+        self.stream.subscribe_bars(self.update_raw, symbol)
         self.active_subs.add(symbol)
 
     def unsubscribe_from_symbol(self, symbol):
@@ -59,6 +263,7 @@ class BarSocket:
         self.active_subs.remove(symbol)
 
     def run(self):
+        load_env()
         if os.environ.get("ENV", "") != "prod":
             return
 
@@ -74,12 +279,14 @@ class BarSocket:
 
     def stop(self):
         # Signal the thread to stop and wait for it to finish
+        load_env()
         if os.environ.get("ENV", "") != "prod":
             return
 
         self.stop_flag.set()
         self.stream.stop()
         self.thread.join()
+        self.flush_raw()
 
 
 GLOBAL_BAR_SOCKET = BarSocket()
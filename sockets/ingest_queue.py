@@ -0,0 +1,176 @@
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+import numpy as np
+
+from shared import Bar, Trade
+from sockets.bar_socket import GLOBAL_BAR_SOCKET, BarSocket
+from sockets.trade_socket import GLOBAL_TRADE_SOCKET, TradeSocket
+
+
+class IngestQueue:
+    # Sits between the stream threads and the subscriber fan-out so a slow
+    # subscriber can't stall the websocket readers. One consumer thread
+    # publishes everything queued.
+    #
+    # Bars are queued per symbol and symbols take turns. When a symbol has
+    # max_pending_bars waiting and another arrives, its backlog is collapsed
+    # to the newest bar, so a burst costs at most one catch-up bar per symbol.
+    # Batches (one per minute from the raw stream) are queued whole and
+    # collapsed the same way, to the newest bar of every symbol, once
+    # max_pending_bars of them are waiting. Trades are never dropped and go
+    # out before any waiting bar.
+    def __init__(
+        self,
+        bar_socket: BarSocket = GLOBAL_BAR_SOCKET,
+        trade_socket: TradeSocket = GLOBAL_TRADE_SOCKET,
+        max_pending_bars: int = 8,
+    ) -> None:
+        self.bar_socket = bar_socket
+        self.trade_socket = trade_socket
+        self.max_pending_bars = max_pending_bars
+
+        self.bars: Dict[str, Deque[Bar]] = {}
+        self.ready: Deque[str] = deque()  # symbols with bars waiting, in turn
+        self.batches: Deque[np.ndarray] = deque()
+        self.trades: Deque[Trade] = deque()
+        self.cond = threading.Condition()
+
+        self.stop_flag = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+        self.enqueued_bars = 0
+        self.enqueued_trades = 0
+        self.published_bars = 0
+        self.published_trades = 0
+        self.coalesced = 0  # bars dropped because a newer one replaced them
+        self.pending_bars = 0
+        self.max_depth = 0
+
+    def put_bar(self, bar: Bar) -> None:
+        with self.cond:
+            pending = self.bars.get(bar.symbol)
+            if pending is None:
+                pending = self.bars[bar.symbol] = deque()
+            if not pending:
+                self.ready.append(bar.symbol)
+            elif len(pending) >= self.max_pending_bars:
+                self.coalesced += len(pending)
+                self.pending_bars -= len(pending)
+                pending.clear()
+
+            pending.append(bar)
+            self.pending_bars += 1
+            self.enqueued_bars += 1
+            self.max_depth = max(self.max_depth, self.depth())
+            self.cond.notify()
+
+    def put_batch(self, batch: np.ndarray) -> None:
+        with self.cond:
+            if len(self.batches) >= self.max_pending_bars:
+                merged = np.concatenate([*self.batches, batch])
+                # last bar of every symbol, in arrival order
+                _, last = np.unique(merged["symbol"][::-1], return_index=True)
+                self.coalesced += len(merged) - len(last)
+                self.pending_bars -= len(merged) - len(batch)
+                batch = merged[np.sort(len(merged) - 1 - last)]
+                self.batches.clear()
+            self.pending_bars += len(batch)
+
+            self.batches.append(batch)
+            self.enqueued_bars += len(batch)
+            self.max_depth = max(self.max_depth, self.depth())
+            self.cond.notify()
+
+    def put_trade(self, trade: Trade) -> None:
+        with self.cond:
+            self.trades.append(trade)
+            self.enqueued_trades += 1
+            self.max_depth = max(self.max_depth, self.depth())
+            self.cond.notify()
+
+    def depth(self) -> int:
+        return self.pending_bars + len(self.trades)
+
+    def stats(self) -> dict:
+        with self.cond:
+            return {
+                "depth": self.depth(),
+                "max_depth": self.max_depth,
+                "pending_bars": self.pending_bars,
+                "pending_trades": len(self.trades),
+                "enqueued_bars": self.enqueued_bars,
+                "enqueued_trades": self.enqueued_trades,
+                "published_bars": self.published_bars,
+                "published_trades": self.published_trades,
+                "coalesced": self.coalesced,
+            }
+
+    def __next(self):
+        # called holding the lock, trades first then one bar per symbol, then
+        # batches
+        if self.trades:
+            return self.trades.popleft()
+
+        if not self.ready:
+            batch = self.batches.popleft()
+            self.pending_bars -= len(batch)
+            return batch
+
+        symbol = self.ready.popleft()
+        pending = self.bars[symbol]
+        bar = pending.popleft()
+        self.pending_bars -= 1
+        if pending:
+            self.ready.append(symbol)
+        return bar
+
+    def _run_thread(self) -> None:
+        while True:
+            with self.cond:
+                while self.depth() == 0 and not self.stop_flag.is_set():
+                    self.cond.wait()
+                if self.depth() == 0:
+                    return
+                item = self.__next()
+
+            # published outside the lock so the stream threads never wait on
+            # a subscriber
+            try:
+                if item.__class__ is Trade:
+                    self.trade_socket.publish(item)
+                    self.published_trades += 1
+                elif item.__class__ is Bar:
+                    self.bar_socket.publish(item)
+                    self.published_bars += 1
+                else:
+                    self.bar_socket.publish_batch(item)
+                    self.published_bars += len(item)
+            except Exception as e:
+                print("Error in subscriber: ", e)
+
+    def start(self) -> None:
+        # from here on the sockets queue what their streams receive instead
+        # of publishing it on the stream thread
+        if self.thread is not None:
+            return
+
+        self.stop_flag.clear()
+        self.thread = threading.Thread(target=self._run_thread, daemon=True)
+        self.thread.start()
+        self.bar_socket.queue = self
+        self.trade_socket.queue = self
+
+    def stop(self) -> None:
+        # publishes what is still queued, then stops the consumer
+        if self.thread is None:
+            return
+
+        self.bar_socket.queue = None
+        self.trade_socket.queue = None
+        with self.cond:
+            self.stop_flag.set()
+            self.cond.notify()
+        self.thread.join()
+        self.thread = None
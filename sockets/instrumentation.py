@@ -0,0 +1,132 @@
+import json
+import threading
+import time
+from typing import Dict, Optional
+
+# latencies are bucketed by power of two nanoseconds, bucket i holds calls
+# that took [2^(i-1), 2^i) ns
+NUM_BUCKETS = 64
+
+
+class LatencyStats:
+    __slots__ = ("count", "total_ns", "max_ns", "buckets")
+
+    def __init__(self) -> None:
+        self.clear()
+
+    def clear(self) -> None:
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * NUM_BUCKETS
+
+    def record(self, ns: int) -> None:
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+        self.buckets[ns.bit_length()] += 1
+
+    def percentile_ns(self, q: float) -> int:
+        # upper bound of the bucket holding the q-th percentile
+        target = self.count * q / 100
+        seen = 0
+        for i, bucket in enumerate(self.buckets):
+            seen += bucket
+            if bucket > 0 and seen >= target:
+                return min(2**i, self.max_ns)
+        return self.max_ns
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_us": self.total_ns / self.count / 1000 if self.count else 0.0,
+            "p50_us": self.percentile_ns(50) / 1000,
+            "p99_us": self.percentile_ns(99) / 1000,
+            "max_us": self.max_ns / 1000,
+            # non-empty buckets as {upper bound in ns: calls}
+            "histogram": {
+                str(2**i): bucket for i, bucket in enumerate(self.buckets) if bucket > 0
+            },
+        }
+
+
+def subscriber_key(subscriber) -> str:
+    name = type(subscriber).__name__
+    if hasattr(subscriber, "name"):
+        return f"{name}:{subscriber.name}"
+    if hasattr(subscriber, "symbol"):
+        return f"{name}:{subscriber.symbol}"
+    return name
+
+
+class Instrumentation:
+    # Call counts and latency histograms keyed by subscriber (or field).
+    # Recording is a dict lookup and a few integer ops, cheap enough to leave
+    # on. Snapshots can be taken from any thread.
+    def __init__(self) -> None:
+        self.stats: Dict[str, LatencyStats] = {}
+        self.subscriber_stats: Dict[object, LatencyStats] = {}
+        self.lock = threading.Lock()
+
+        self.dump_thread: Optional[threading.Thread] = None
+        self.dump_stop = threading.Event()
+
+    def stats_for(self, key: str) -> LatencyStats:
+        stats = self.stats.get(key)
+        if stats is None:
+            with self.lock:
+                stats = self.stats.setdefault(key, LatencyStats())
+        return stats
+
+    def for_subscriber(self, subscriber) -> LatencyStats:
+        # hot path, the subscriber's stats are cached by identity
+        stats = self.subscriber_stats.get(subscriber)
+        if stats is None:
+            stats = self.stats_for(subscriber_key(subscriber))
+            self.subscriber_stats[subscriber] = stats
+        return stats
+
+    def record(self, key: str, ns: int) -> None:
+        self.stats_for(key).record(ns)
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self.lock:
+            items = list(self.stats.items())
+        return {key: stats.summary() for key, stats in sorted(items)}
+
+    def reset(self) -> None:
+        with self.lock:
+            for stats in self.stats.values():
+                stats.clear()
+
+    def start_dump(self, path: str, interval: float = 60) -> None:
+        # appends one JSON line per interval: {"time": ..., "stats": snapshot}
+        if self.dump_thread is not None:
+            return
+
+        self.dump_stop.clear()
+        self.dump_thread = threading.Thread(
+            target=self._dump_thread, args=(path, interval), daemon=True
+        )
+        self.dump_thread.start()
+
+    def stop_dump(self) -> None:
+        if self.dump_thread is None:
+            return
+
+        self.dump_stop.set()
+        self.dump_thread.join()
+        self.dump_thread = None
+
+    def dump(self, path: str) -> None:
+        with open(path, "a") as file:
+            file.write(json.dumps({"time": time.time(), "stats": self.snapshot()}))
+            file.write("\n")
+
+    def _dump_thread(self, path: str, interval: float) -> None:
+        while not self.dump_stop.wait(interval):
+            try:
+                self.dump(path)
+            except Exception as e:
+                print("Error dumping instrumentation: ", e)
@@ -1,11 +1,16 @@
 import os
 import threading
+import time
 from abc import ABC, abstractmethod
+from typing import Dict, Optional
 
-from alpaca.trading.stream import TradingStream
-from dotenv import load_dotenv
+from journal import GLOBAL_JOURNAL, INFO
+from shared import Trade, load_env
+from sockets.instrumentation import Instrumentation
 
-from shared import Trade
+# trade update events that end an order without (or without the rest of) a
+# fill
+FAILED_EVENTS = ("canceled", "expired", "rejected")
 
 
 class TradeSubscriber(ABC):
@@ -14,38 +19,181 @@ class TradeSubscriber(ABC):
         pass
 
 
+class OrderSubscriber(ABC):
+    # told when an order ends in one of FAILED_EVENTS
+    @abstractmethod
+    def update_order(self, event: str, order_id: str, client_order_id: Optional[str]):
+        pass
+
+
 class TradeSocket:
     def __init__(self):
-        load_dotenv()
-        self.stream = TradingStream(
-            os.environ.get("ALPACA_KEY", ""),
-            os.environ.get("ALPACA_SECRET", ""),
-            paper=True,
-        )
+        # built on first use, see stream
+        self._stream = None
 
         self.stop_flag = threading.Event()
-        self.subscribers: list[TradeSubscriber] = []
+        # subscribers keyed by the symbol they care about, plus a wildcard
+        # bucket for subscribers that want every trade (e.g. cash)
+        self.subscribers: Dict[str, list[TradeSubscriber]] = {}
+        self.wildcard_subscribers: list[TradeSubscriber] = []
+        self.order_subscribers: list[OrderSubscriber] = []
+
+        # optional per-subscriber latency recording, see enable_instrumentation
+        self.instrumentation: Optional[Instrumentation] = None
+
+        # set by IngestQueue.start, stream trades are queued instead of being
+        # published on the stream thread
+        self.queue = None
+
+    @property
+    def stream(self):
+        # the alpaca stream (and its imports) only once run in prod
+        if self._stream is None:
+            from alpaca.trading.stream import TradingStream
+
+            load_env()
+            self._stream = TradingStream(
+                os.environ.get("ALPACA_KEY", ""),
+                os.environ.get("ALPACA_SECRET", ""),
+                paper=True,
+                raw_data=True,
+            )
+        return self._stream
+
+    def add_subscriber(self, subscriber, symbol: Optional[str] = None):
+        if symbol is None:
+            self.wildcard_subscribers.append(subscriber)
+        else:
+            self.subscribers.setdefault(symbol, []).append(subscriber)
+
+    def remove_subscriber(self, subscriber, symbol: Optional[str] = None):
+        if symbol is None:
+            self.wildcard_subscribers.remove(subscriber)
+            return
+
+        subs = self.subscribers.get(symbol, [])
+        subs.remove(subscriber)
+        if len(subs) == 0:
+            del self.subscribers[symbol]
+
+    def add_order_subscriber(self, subscriber: OrderSubscriber):
+        self.order_subscribers.append(subscriber)
+
+    def remove_order_subscriber(self, subscriber: OrderSubscriber):
+        self.order_subscribers.remove(subscriber)
+
+    async def update_all(self, msg):
+        # raw stream message, the trade update itself is under "data"
+        data = msg["data"]
+        if self.__order_failed(data):
+            return
 
-    def add_subscriber(self, subscriber):
-        self.subscribers.append(subscriber)
+        trade = self.__decode(data)
+        if trade is None:
+            return
+
+        if self.queue is not None:
+            self.queue.put_trade(trade)
+        else:
+            self.publish(trade)
 
-    async def update_all(self, data):
-        if not data["qty"] or not data["price"]:
+    def receive(self, data):
+        # synchronous version of update_all for fills generated in process,
+        # taking the trade update itself, always published on the caller's
+        # thread
+        if self.__order_failed(data):
             return
 
-        side = data["order"]["side"]
-        symbol = data["order"]["symbol"]
+        trade = self.__decode(data)
+        if trade is not None:
+            self.publish(trade)
+
+    def __order_failed(self, data) -> bool:
+        # failed orders carry no fill, they only go to the order subscribers.
+        # Published right away even when queued, they only end the order and
+        # any of its fills still queued are applied regardless.
+        event = data.get("event")
+        if event not in FAILED_EVENTS:
+            return False
+
+        order = data["order"]
+        order_id = order.get("id")
+        client_order_id = order.get("client_order_id")
+        GLOBAL_JOURNAL.record(
+            INFO,
+            "order",
+            update=event,
+            symbol=order.get("symbol"),
+            order_id=order_id,
+            client_order_id=client_order_id,
+        )
+        for sub in self.order_subscribers:
+            sub.update_order(event, order_id, client_order_id)
+        return True
+
+    def __decode(self, data) -> Optional[Trade]:
+        if not data.get("qty") or not data.get("price"):
+            return None
+
+        order = data["order"]
+        side = order["side"]
+        symbol = order["symbol"]
         qty = float(data["qty"])
         price = float(data["price"])
         timestamp = data["timestamp"]
+        order_id = order.get("id")
+        client_order_id = order.get("client_order_id")
+        event = data.get("event", "fill")
 
-        trade = Trade(side, symbol, qty, price, timestamp)
+        trade = Trade(
+            side, symbol, qty, price, timestamp, order_id, client_order_id, event
+        )
 
-        for sub in self.subscribers:
+        GLOBAL_JOURNAL.record(
+            INFO,
+            "trade",
+            side=side,
+            symbol=symbol,
+            qty=qty,
+            price=price,
+            timestamp=timestamp,
+            order_id=order_id,
+            update=event,
+        )
+        return trade
+
+    def enable_instrumentation(
+        self, instrumentation: Optional[Instrumentation] = None
+    ) -> Instrumentation:
+        if instrumentation is None:
+            instrumentation = Instrumentation()
+        self.instrumentation = instrumentation
+        return instrumentation
+
+    def disable_instrumentation(self):
+        self.instrumentation = None
+
+    def publish(self, trade: Trade):
+        if self.instrumentation is not None:
+            self.__publish_timed(trade)
+            return
+
+        for sub in self.subscribers.get(trade.symbol, ()):
             sub.update_trade(trade)
+        for sub in self.wildcard_subscribers:
+            sub.update_trade(trade)
+
+    def __publish_timed(self, trade: Trade):
+        for_subscriber = self.instrumentation.for_subscriber
+        for subs in (self.subscribers.get(trade.symbol, ()), self.wildcard_subscribers):
+            for sub in subs:
+                start = time.perf_counter_ns()
+                sub.update_trade(trade)
+                for_subscriber(sub).record(time.perf_counter_ns() - start)
 
     def run(self):
         # Create and start the thread
+        load_env()
         if os.environ.get("ENV", "") != "prod":
             return
 
@@ -63,6 +211,7 @@ class TradeSocket:
 
     def stop(self):
         # Signal the thread to stop and wait for it to finish
+        load_env()
         if os.environ.get("ENV", "") != "prod":
             return
         self.stop_flag.set()